@@ -1,27 +1,119 @@
 # 認証機能を実装するモジュール
 # JWT（JSON Web Token）を使用してセッション管理を行う
 
-from datetime import datetime, timedelta, timezone
-from typing import Any  # 日時処理用
-from jose import JWTError, jwt  # JWTトークンの生成・検証用
-from passlib.context import CryptContext  # パスワードのハッシュ化用
+from datetime import timedelta  # 日時処理用
+import time  # 現在時刻（UNIX時間）の取得用
+from threading import RLock  # キャッシュの排他制御用
+import copy  # キャッシュしたユーザー情報のコピー用
+import hashlib  # キャッシュのキー（トークンのハッシュ値）の計算用
+import logging  # エラーのログ出力用
+from cachetools import TTLCache, TLRUCache  # 有効期限付きのキャッシュ
+import jwt  # JWTトークンの生成・検証用（PyJWT）
+from jwt import InvalidTokenError, DecodeError  # トークンが無効な場合の例外
+import orjson  # JWTペイロードの高速なJSON変換用
+from argon2 import PasswordHasher  # パスワードのハッシュ化用（argon2id）
+from argon2.exceptions import VerificationError, InvalidHashError  # 照合失敗・不正なハッシュの例外
+import bcrypt  # 移行前（bcrypt）のハッシュの照合用
+import psycopg2  # データベースエラーの捕捉用
 from fastapi import HTTPException, status  # HTTP例外処理用
-from database import get_db_connection, get_db_cursor  # データベース接続用
-import os  # 環境変数の取得に使用
-from dotenv import load_dotenv  # .envファイルから環境変数を読み込む
+from fastapi.concurrency import run_in_threadpool  # 重い同期処理をスレッドプールで実行する
+from database import get_db_connection, get_db_cursor, release_db_connection, execute_prepared  # データベース接続用
+from settings import ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM, PWD_WARMUP, SECRET_KEY  # 環境変数から読み込んだ設定値
 
-# .envファイルから環境変数を読み込む
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 # パスワードハッシュ化の設定
-# bcryptアルゴリズムを使用してパスワードをハッシュ化
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# argon2id（メモリハード、GPUでの総当たりに強い）でパスワードをハッシュ化する
+# パラメータはsettings（環境変数ARGON2_TIME_COST / ARGON2_MEMORY_COST / ARGON2_PARALLELISM）で調整する
+# 照合中はC拡張がGILを解放するため、スレッドプールで並列に実行できる
+_password_hasher = PasswordHasher(
+    time_cost=ARGON2_TIME_COST,
+    memory_cost=ARGON2_MEMORY_COST,
+    parallelism=ARGON2_PARALLELISM,
+)
+# 移行前にbcryptで保存されたハッシュの接頭辞（ログイン成功時にargon2idへ置き換える）
+_BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+
+# ユーザーが存在しない場合に照合するダミーのハッシュ（デフォルト設定のargon2id、PWD_WARMUP有効時は起動時に作り直す）
+# 存在しないユーザーでも同じだけ時間をかけ、応答時間からユーザーの有無が分からないようにする
+_DUMMY_PASSWORD_HASH = "$argon2id$v=19$m=65536,t=3,p=2$j/1DHJIFGO+K2ytOvj4jcw$/sG/VV5uUIXnU/MYezWo+AB32A5jI3qI3PBFnw/9x/U"
 
 # JWT設定
-# 環境変数から取得（開発環境用のデフォルト値を設定）
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")  # JWT署名用の秘密鍵
+# 署名用の秘密鍵はsettings.SECRET_KEY（環境変数SECRET_KEY）を使用する
 ALGORITHM = "HS256"  # JWT署名アルゴリズム
+# 署名・検証のたびに秘密鍵の変換やアルゴリズムのリスト生成をしないよう、事前に作っておく
+_SECRET_KEY_BYTES = SECRET_KEY.encode("utf-8")
+_ALGORITHMS = [ALGORITHM]
+# 検証時のオプション。exp（有効期限）とsub（メールアドレス）のないトークンは署名が正しくても無効とする
+_DECODE_OPTIONS = {"require": ["exp", "sub"]}
 ACCESS_TOKEN_EXPIRE_MINUTES = 30  # トークンの有効期限（30分）
+# デフォルトの有効期限（秒）。呼び出しのたびにtimedeltaを作らないよう事前に計算しておく
+_DEFAULT_EXPIRE_SECONDS = int(timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES).total_seconds())
+# 401応答に付けるヘッダー（応答側でコピーされるので共有してよい）
+# 例外インスタンス自体は送出のたびにトレースバックが書き込まれるため使い回さない
+_BEARER_CHALLENGE_HEADERS = {"WWW-Authenticate": "Bearer"}
+
+# ユーザー情報のキャッシュ（メールアドレス → ユーザー情報）
+# 認証のたびに同じユーザーをDBから検索しないよう、60秒間メモリに保持する
+_USER_CACHE = TTLCache(maxsize=10_000, ttl=60)
+_USER_CACHE_LOCK = RLock()  # 複数スレッドから同時に更新されても壊れないようにする
+
+# トークン検証結果のキャッシュ（トークンのハッシュ値 → トークンの中身）
+# 同じトークンで何度もAPIを呼ぶ場合に、毎回の署名検証を省略する
+_TOKEN_CACHE_TTL = 30  # キャッシュの最大保持時間（秒）
+
+
+def _token_cache_ttu(_key, payload: dict, now: float) -> float:
+    """キャッシュの期限は30秒後とトークン自体の有効期限(exp)の早い方にする"""
+    return min(now + _TOKEN_CACHE_TTL, payload.get("exp", now))
+
+
+# 期限切れのトークンがキャッシュから返らないよう、expと同じUNIX時間で期限を管理する
+_TOKEN_CACHE = TLRUCache(maxsize=50_000, ttu=_token_cache_ttu, timer=time.time)
+_TOKEN_CACHE_LOCK = RLock()
+
+# 検証に失敗したトークンのキャッシュ（トークンのハッシュ値）
+# 同じ不正なトークンが繰り返し送られてきた場合に、署名検証をせずにすぐ401を返す
+# 期限は短くし、件数の上限で大量の不正トークンによるメモリの増加を抑える
+_INVALID_TOKEN_CACHE = TTLCache(maxsize=20_000, ttl=2)
+_INVALID_TOKEN_CACHE_LOCK = RLock()
+
+# 認証済みユーザーのキャッシュ（トークンのハッシュ値 → (exp, ユーザー情報)）
+# トークン検証とユーザー検索の両方を省き、認証付きリクエストの処理を短くする
+_CURRENT_USER_CACHE_TTL = 10  # キャッシュの最大保持時間（秒）
+
+
+def _current_user_cache_ttu(_key, value: tuple, now: float) -> float:
+    """キャッシュの期限は10秒後とトークン自体の有効期限(exp)の早い方にする"""
+    exp, _user = value
+    return min(now + _CURRENT_USER_CACHE_TTL, exp)
+
+
+_CURRENT_USER_CACHE = TLRUCache(maxsize=10_000, ttu=_current_user_cache_ttu, timer=time.time)
+_CURRENT_USER_CACHE_LOCK = RLock()
+
+
+class _OrjsonJWT(jwt.PyJWT):
+    """
+    ペイロードのJSON変換に標準のjsonではなくorjsonを使うPyJWT
+    ログインのたびにエンコード、認証付きリクエストのたびにデコードが走るため高速化する
+    """
+    
+    def _encode_payload(self, payload: dict, headers: dict = None, json_encoder=None) -> bytes:
+        return orjson.dumps(payload)
+    
+    def _decode_payload(self, decoded: dict) -> dict:
+        try:
+            payload = orjson.loads(decoded["payload"])
+        except orjson.JSONDecodeError as e:
+            raise DecodeError(f"Invalid payload string: {e}") from e
+        if not isinstance(payload, dict):
+            raise DecodeError("Invalid payload string: must be a json object")
+        return payload
+
+
+# トークンの生成・検証に使うインスタンス
+_jwt = _OrjsonJWT()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -35,7 +127,13 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         bool: パスワードが一致する場合True
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    # 移行前のbcryptハッシュはbcryptで照合する
+    if hashed_password.startswith(_BCRYPT_PREFIXES):
+        return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+    try:
+        return _password_hasher.verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
 
 
 def get_password_hash(password: str) -> str:
@@ -48,7 +146,31 @@ def get_password_hash(password: str) -> str:
     Returns:
         str: ハッシュ化されたパスワード
     """
-    return pwd_context.hash(password)
+    return _password_hasher.hash(password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    保存されているハッシュを作り直すべきかを判定する関数
+    
+    Args:
+        hashed_password: ハッシュ化されたパスワード
+    
+    Returns:
+        bool: bcryptのハッシュ、または現在の設定と異なるargon2のパラメータの場合True
+    """
+    if hashed_password.startswith(_BCRYPT_PREFIXES):
+        return True
+    try:
+        return _password_hasher.check_needs_rehash(hashed_password)
+    except InvalidHashError:
+        return False
+
+
+# import時にハッシュ化を1回実行しておき、最初のログインで初期化コストを払わないようにする
+# 同時にダミーのハッシュを現在の設定で作り直し、存在しないユーザーの照合時間を実在ユーザーと揃える
+if PWD_WARMUP:
+    _DUMMY_PASSWORD_HASH = get_password_hash("warmup")
 
 
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
@@ -68,17 +190,17 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     # トークンに含めるデータをコピー
     to_encode = data.copy()
     
-    # 有効期限の設定
+    # 有効期限の設定（JWTのexpはUNIX時間の整数秒なので、datetimeを作らず直接計算する）
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = int(time.time() + expires_delta.total_seconds())
     else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = int(time.time()) + _DEFAULT_EXPIRE_SECONDS
     
     # 有効期限をトークンデータに追加
     to_encode.update({"exp": expire}) # updateメソッドは、辞書に新しいキーと値を追加する(キー被りは上書き)。
     
     # JWTトークンを生成。SECRET_KEYはJWT署名用の秘密鍵で環境変数に追加。
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = _jwt.encode(to_encode, _SECRET_KEY_BYTES, algorithm=ALGORITHM)
     return encoded_jwt
 
 
@@ -95,22 +217,101 @@ def verify_token(token: str) -> dict:
     Raises:
         HTTPException: トークンが無効な場合
     """
+    # トークン文字列は長いので、ハッシュ値をキャッシュのキーにする
+    cache_key = hashlib.sha256(token.encode("utf-8")).digest()
+    with _TOKEN_CACHE_LOCK:
+        cached = _TOKEN_CACHE.get(cache_key)
+    if cached is not None:
+        return dict(cached)
+    
+    with _INVALID_TOKEN_CACHE_LOCK:
+        known_invalid = cache_key in _INVALID_TOKEN_CACHE
+    
     try:
+        if known_invalid:
+            # 直前に検証に失敗したトークンは、署名検証をせずに無効とする
+            raise InvalidTokenError
         # トークンをデコード（署名検証も同時に実行）
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
+        payload = _jwt.decode(token, _SECRET_KEY_BYTES, algorithms=_ALGORITHMS, options=_DECODE_OPTIONS)
+        with _TOKEN_CACHE_LOCK:
+            _TOKEN_CACHE[cache_key] = payload
+        return dict(payload)
+    except InvalidTokenError:
+        with _INVALID_TOKEN_CACHE_LOCK:
+            _INVALID_TOKEN_CACHE[cache_key] = True
         # トークンが無効な場合、401エラーを返す
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="無効なトークンです",
-            headers={"WWW-Authenticate": "Bearer"},
+            headers=_BEARER_CHALLENGE_HEADERS,
         )
 
 
+def clear_auth_caches() -> None:
+    """
+    認証関連のキャッシュ（ユーザー情報・トークン検証結果）をすべて削除する関数
+    """
+    with _USER_CACHE_LOCK:
+        _USER_CACHE.clear()
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE.clear()
+    with _INVALID_TOKEN_CACHE_LOCK:
+        _INVALID_TOKEN_CACHE.clear()
+    with _CURRENT_USER_CACHE_LOCK:
+        _CURRENT_USER_CACHE.clear()
+
+
+def get_user_by_token(token: str) -> dict:
+    """
+    JWTトークンから認証済みのユーザー情報を取得する関数
+    成功した結果だけを短時間キャッシュし、同じトークンでの連続したリクエストでは
+    トークンの検証とユーザーの検索を省略する（失敗はキャッシュしない）
+    
+    Args:
+        token: JWTトークン
+    
+    Returns:
+        dict: ユーザー情報（パスワードハッシュは含まない）
+    
+    Raises:
+        HTTPException: トークンが無効な場合、またはユーザーが見つからない場合
+    """
+    cache_key = hashlib.sha256(token.encode("utf-8")).digest()
+    with _CURRENT_USER_CACHE_LOCK:
+        cached = _CURRENT_USER_CACHE.get(cache_key)
+    if cached is not None:
+        # 呼び出し元で変更してもキャッシュが変わらないようにコピーを返す
+        return dict(cached[1])
+    
+    # トークンを検証
+    payload = verify_token(token)
+    email = payload.get("sub")  # トークンに含まれるメールアドレス
+    
+    if email is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="無効な認証情報です"
+        )
+    
+    # ユーザー情報を取得
+    user = get_user_by_email(email)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="ユーザーが見つかりません"
+        )
+    
+    # パスワードハッシュを返さないようにする
+    user.pop("password_hash", None)
+    with _CURRENT_USER_CACHE_LOCK:
+        _CURRENT_USER_CACHE[cache_key] = (payload.get("exp", time.time()), user)
+    return dict(user)
+
+
 def get_user_by_email(email: str) -> dict:
     """
     メールアドレスでユーザーを検索する関数
+    一度検索したユーザーはキャッシュし、有効期限内はDBに問い合わせない
     
     Args:
         email: メールアドレス
@@ -118,22 +319,42 @@ def get_user_by_email(email: str) -> dict:
     Returns:
         dict: ユーザー情報（見つからない場合はNone）
     """
+    with _USER_CACHE_LOCK:
+        cached = _USER_CACHE.get(email)
+    if cached is not None:
+        # 呼び出し元でpopなどをしてもキャッシュが変わらないようにコピーを返す
+        return copy.copy(cached)
+    
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     
     try:
         # メールアドレスでユーザーを検索。プレースホルダでSQLインジェクションに対応。
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,)) # タプル形式(1つの要素で,あり)でパラメータを渡す
+        # 認証と/api/auth/meで使う列だけを取得する（SELECT *は使わない）
+        # ログインのたびに同じSQLを実行するため、プリペアドステートメントでパースと実行計画を使い回す
+        execute_prepared(
+            cursor,
+            "get_user_by_email",
+            "SELECT id, email, name, password_hash, created_at FROM users WHERE email = $1",
+            (email,) # タプル形式(1つの要素で,あり)でパラメータを渡す
+        )
         user = cursor.fetchone()
-        return dict[Any, Any](user) if user else None
+        if not user:
+            return None
+        # キャッシュに保持するため、カーソル由来のRealDictRowではなく素のdictにする
+        user = dict(user)
+        with _USER_CACHE_LOCK:
+            _USER_CACHE[email] = user
+        return copy.copy(user)
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 
-def create_user(email: str, password: str, name: str) -> dict:
+async def create_user(email: str, password: str, name: str) -> dict:
     """
     新しいユーザーを作成する関数
+    パスワードのハッシュ化とDBへの挿入はスレッドプールで実行し、イベントループを止めない
     
     Args:
         email: メールアドレス
@@ -143,6 +364,27 @@ def create_user(email: str, password: str, name: str) -> dict:
     Returns:
         dict: 作成されたユーザー情報
     
+    Raises:
+        HTTPException: メールアドレスが既に登録されている場合
+    """
+    # パスワードをハッシュ化（argon2idは重いのでスレッドプールで実行）
+    # ハッシュ化の間DB接続を占有しないよう、接続を借りる前に済ませる
+    password_hash = await run_in_threadpool(get_password_hash, password)
+    return await run_in_threadpool(_insert_user, email, password_hash, name)
+
+
+def _insert_user(email: str, password_hash: str, name: str) -> dict:
+    """
+    ハッシュ化済みのパスワードでユーザーをデータベースに挿入する関数
+    
+    Args:
+        email: メールアドレス
+        password_hash: パスワードハッシュ
+        name: ユーザー名
+    
+    Returns:
+        dict: 作成されたユーザー情報（パスワードハッシュを除く）
+    
     Raises:
         HTTPException: メールアドレスが既に登録されている場合
     """
@@ -150,42 +392,43 @@ def create_user(email: str, password: str, name: str) -> dict:
     cursor = get_db_cursor(conn)
     
     try:
-        # パスワードをハッシュ化
-        password_hash = get_password_hash(password)
-        
-        # ユーザーをデータベースに挿入
+        # ユーザーをデータベースに挿入（重複時は挿入せず何も返さない）
         cursor.execute(
             """
             INSERT INTO users (email, password_hash, name)
             VALUES (%s, %s, %s)
-            RETURNING id, email, name, created_at
+            ON CONFLICT (email) DO NOTHING
+            RETURNING id, email, name, password_hash, created_at
             """,
             (email, password_hash, name)
         )
         
         user = cursor.fetchone()
         conn.commit()
-        return dict[Any, Any](user) if user else None
-    except Exception as e:
-        conn.rollback()
         # 既にメールアドレスが登録されている場合
-        if "unique" in str(e).lower():
+        if user is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="このメールアドレスは既に登録されています"
             )
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="ユーザー作成に失敗しました"
-        )
+        # get_user_by_emailと同じ列を取得しているので、そのままキャッシュに入れる
+        # （登録直後の/api/auth/meやログインでDBに問い合わせずに済む）
+        user = dict(user)
+        with _USER_CACHE_LOCK:
+            _USER_CACHE[email] = user
+        # パスワードハッシュは返さない
+        created_user = copy.copy(user)
+        created_user.pop("password_hash", None)
+        return created_user
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 
-def authenticate_user(email: str, password: str) -> dict:
+async def authenticate_user(email: str, password: str) -> dict:
     """
     ユーザー認証を行う関数
+    ユーザーの検索とパスワードの照合はスレッドプールで実行し、イベントループを止めない
     
     Args:
         email: メールアドレス
@@ -198,24 +441,57 @@ def authenticate_user(email: str, password: str) -> dict:
         HTTPException: 認証に失敗した場合
     """
     # ユーザーをデータベースから検索。
-    user = get_user_by_email(email)
+    user = await run_in_threadpool(get_user_by_email, email)
     
-    if not user:
-        # ユーザーが見つからない場合
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="んメールアドレスまたはパスワードが正しくありませ"
-        )
+    # ユーザーが見つからない場合もダミーのハッシュで照合し、処理時間を揃える
+    password_hash = user["password_hash"] if user else _DUMMY_PASSWORD_HASH
+    password_ok = await run_in_threadpool(verify_password, password, password_hash)
     
-    # パスワードを照合
-    if not verify_password(password, user["password_hash"]):
-        # パスワードが一致しない場合
+    if not user or not password_ok:
+        # ユーザーが見つからない、またはパスワードが一致しない場合
+        # どちらの場合も同じメッセージを返す
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="メールアドレスまたはパスワードが正しくありません"
         )
     
+    # 移行前のbcryptハッシュなどは、平文のパスワードが分かるこのタイミングで作り直す
+    if password_needs_rehash(password_hash):
+        new_hash = await run_in_threadpool(get_password_hash, password)
+        await run_in_threadpool(_update_password_hash, user["id"], email, new_hash)
+    
     # パスワードハッシュを返さないようにする（セキュリティのため）
     user.pop("password_hash", None)
     return user
 
+
+def _update_password_hash(user_id: int, email: str, password_hash: str) -> None:
+    """
+    保存されているパスワードハッシュを置き換える関数
+    失敗してもログイン自体は成功させ、次回のログインで再度置き換える
+    
+    Args:
+        user_id: ユーザーID
+        email: メールアドレス（キャッシュの削除に使用）
+        password_hash: 新しいパスワードハッシュ
+    """
+    conn = get_db_connection()
+    cursor = get_db_cursor(conn)
+    
+    try:
+        cursor.execute(
+            "UPDATE users SET password_hash = %s WHERE id = %s",
+            (password_hash, user_id)
+        )
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        logger.warning("パスワードハッシュの更新エラー: %s", e)
+        return
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+    
+    # 古いハッシュがキャッシュに残らないようにする
+    with _USER_CACHE_LOCK:
+        _USER_CACHE.pop(email, None)
@@ -4,14 +4,14 @@ pytest設定ファイル
 """
 import pytest
 import os
+import importlib.machinery
+import psycopg2
+import psycopg2.extensions
 import sys
+from datetime import date, timedelta
 from typing import Generator
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
-from dotenv import load_dotenv  
-
-# .envファイルから環境変数を読み込む
-load_dotenv()
+from unittest.mock import patch, MagicMock, AsyncMock
 
 # abspath: このファイルの絶対パスを取得
 # dirname: このファイルが入っているディレクトリ名を取得
@@ -19,14 +19,56 @@ load_dotenv()
 # 結果的に
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-# テスト用データベース設定（環境変数で上書き可能）
-TEST_DB_CONFIG = {
-    "host": os.getenv("DB_HOST", "localhost"),  # データベースホスト（デフォルト: localhost）
-    "port": os.getenv("DB_PORT", "5432"),  # データベースポート（デフォルト: 5432）
-    "database": os.getenv("DB_NAME", "ramen_restaurant"),  # データベース名（デフォルト: ramen_restaurant）
-    "user": os.getenv("DB_USER", "postgres"),  # データベースユーザー名（デフォルト: postgres）
-    "password": os.getenv("DB_PASSWORD", "postgres"),  # データベースパスワード（デフォルト: postgres）
-}
+# 同名のモジュール（database.pyなど）が複数のパスにあると、どちらが読み込まれるかが
+# sys.pathの順序次第になるため、テスト開始時に検出して止める
+for _module_name in ("database", "auth", "settings", "server"):
+    _locations = {
+        os.path.realpath(spec.origin)
+        for spec in (
+            importlib.machinery.PathFinder.find_spec(_module_name, [entry])
+            for entry in dict.fromkeys(sys.path)
+        )
+        if spec is not None and spec.origin
+    }
+    if len(_locations) > 1:
+        raise RuntimeError(f"モジュール {_module_name} が複数見つかりました: {sorted(_locations)}")
+
+# パスワードのハッシュ化はテストごとのユーザー登録で毎回実行されるため、コストを最小にする
+# (本番と同じ64MiB・3回の設定だと、登録1回ごとにハッシュ化の時間がかかる)
+# settingsの読み込み前に設定する必要がある。環境変数で明示した値があればそちらを優先する
+os.environ.setdefault("ARGON2_TIME_COST", "1")
+os.environ.setdefault("ARGON2_MEMORY_COST", "1024")
+os.environ.setdefault("ARGON2_PARALLELISM", "1")
+os.environ.setdefault("PWD_WARMUP", "0")
+
+# テスト用データベース設定（.envの読み込みと環境変数での上書きはsettingsで行う）
+from settings import DB_CONFIG as TEST_DB_CONFIG
+
+# フィクスチャで作成する予約の日付（test_reservation.pyと同じく、読み込み時に1回だけ計算する）
+_FUTURE = str(date.today() + timedelta(days=7))
+
+# pytest-xdist（pytest -n auto）で並列実行する場合は、ワーカーごとに別のデータベースを使う
+# (DB_CONFIGはdatabaseモジュールと同じ辞書なので、アプリの接続先も切り替わる)
+_XDIST_WORKER = os.environ.get("PYTEST_XDIST_WORKER")
+_BASE_DB_NAME = TEST_DB_CONFIG["database"]
+if _XDIST_WORKER:
+    TEST_DB_CONFIG["database"] = f"{_BASE_DB_NAME}_{_XDIST_WORKER}"
+
+
+def _create_worker_database():
+    """ワーカー用のデータベースがなければ作成する（元のデータベースに接続して作成する）"""
+    conn = psycopg2.connect(**{**TEST_DB_CONFIG, "database": _BASE_DB_NAME})
+    conn.autocommit = True  # CREATE DATABASEはトランザクション内で実行できない
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (TEST_DB_CONFIG["database"],))
+            if cursor.fetchone() is None:
+                # 日本語のデータを扱うため、テンプレートの設定によらずUTF-8で作成する
+                name = TEST_DB_CONFIG["database"]
+                cursor.execute(f"CREATE DATABASE \"{name}\" TEMPLATE template0 ENCODING 'UTF8'")
+    finally:
+        conn.close()
+
 
 # テスト用環境変数を設定
 # scope: session (テスト全体の開始から終了までの間)
@@ -49,103 +91,208 @@ def setup_test_env():
     # 後処理。全テストが終わった後に実行される
     # テスト終了後のクリーンアップ（必要に応じて）
 
+# 認証モジュールのキャッシュはプロセス内で共有されるため、テストごとに空にする
+# (テストデータはテストごとに削除されるので、前のテストのユーザー情報が残ると不整合になる)
+@pytest.fixture(autouse=True)
+def clear_auth_cache():
+    from auth import clear_auth_caches
+    clear_auth_caches()
+    # 予約一覧・メニュー・Payment Intentのキャッシュも同様に空にする（serverが読み込まれている場合のみ）
+    server = sys.modules.get("server")
+    if server is not None:
+        server._RESERVATIONS_CACHE.clear()
+        server._MENU_CACHE.clear()
+        server._PAYMENT_INTENT_CACHE.clear()
+    yield
+
+# patchはセッション全体で1回だけ適用し、テストごとにモックの状態をリセットして設定し直す
+# (テスト内でreturn_valueなどを書き換えても、次のテストに影響しないようにする)
+@pytest.fixture(scope="session")
+def stripe_patch():
+    """server.stripeをセッション全体でモックに差し替える"""
+    with patch('server.stripe') as mock:
+        yield mock
+
+
+@pytest.fixture(scope="session")
+def openai_patch():
+    """server.get_openaiが返すクライアントをセッション全体でモックに差し替える"""
+    with patch('server._openai') as mock:
+        yield mock
+
+
+@pytest.fixture(scope="session")
+def slack_patch():
+    """Slack送信関数をセッション全体でモックに差し替える"""
+    # slack_notificationはsetup_test_envより前にimportされることがあるため、Webhook URLもここで設定する
+    with patch('slack_notification.SLACK_WEBHOOK_URL', "https://hooks.slack.com/test/mock"), \
+         patch('slack_notification.send_slack_notification') as mock:
+        yield mock
+
+
 # fixtureの引数がない時はデフォルトのscopeがfunction, autouseがFalse (テスト関数でmock_stripeと指定して実行される)。
-# patch関数でテストの間だけオブジェクトをモックにすり替える。withを抜けると元に戻る。
 @pytest.fixture
-def mock_stripe():
+def mock_stripe(stripe_patch):
     """Stripe APIのモック"""
-    with patch('server.stripe') as mock:
-        # Payment Intentのモック
-        mock_payment_intent = MagicMock() # どんなメソッドを読んでもエラーにならず指定した値を返すテスト用オブジェクト
-        mock_payment_intent.id = "pi_test_123"
-        mock_payment_intent.client_secret = "pi_test_123_secret_test"
-        mock_payment_intent.status = "succeeded"
-        mock_payment_intent.amount = 1000
-        mock_payment_intent.latest_charge = "ch_test_123"
-        
-        # 指定していないメソッドを呼ぶとエラーにはならず、新しいMagicMockオブジェクトが返ってくる。
-        mock.PaymentIntent.create.return_value = mock_payment_intent
-        mock.PaymentIntent.retrieve.return_value = mock_payment_intent
-        
-        # Refundのモック
-        mock_refund = MagicMock()
-        mock_refund.id = "re_test_123"
-        mock_refund.amount = 1000
-        mock_refund.status = "succeeded"
-        mock.Refund.create.return_value = mock_refund
-        
-        yield mock
+    mock = stripe_patch
+    # 前のテストの呼び出し履歴を消す（戻り値は以下で毎回設定し直す）
+    mock.reset_mock()
+    
+    # Payment Intentのモック
+    mock_payment_intent = MagicMock() # どんなメソッドを読んでもエラーにならず指定した値を返すテスト用オブジェクト
+    mock_payment_intent.id = "pi_test_123"
+    mock_payment_intent.client_secret = "pi_test_123_secret_test"
+    mock_payment_intent.status = "succeeded"
+    mock_payment_intent.amount = 1000
+    mock_payment_intent.latest_charge = "ch_test_123"
+    
+    # 指定していないメソッドを呼ぶとエラーにはならず、新しいMagicMockオブジェクトが返ってくる。
+    mock.PaymentIntent.create.return_value = mock_payment_intent
+    mock.PaymentIntent.retrieve.return_value = mock_payment_intent
+    
+    # Refundのモック
+    mock_refund = MagicMock()
+    mock_refund.id = "re_test_123"
+    mock_refund.amount = 1000
+    mock_refund.status = "succeeded"
+    mock.Refund.create.return_value = mock_refund
+    
+    return mock
 
 
 @pytest.fixture
-def mock_openai():
+def mock_openai(openai_patch):
     """OpenAI APIのモック"""
-    with patch('server.openai') as mock:
-        mock_session = MagicMock()
-        mock_session.client_secret = "session_test_secret"
-        mock.beta.chatkit.sessions.create.return_value = mock_session
-        yield mock
+    mock = openai_patch
+    mock.reset_mock()
+    mock_session = MagicMock()
+    mock_session.client_secret = "session_test_secret"
+    # AsyncOpenAIのメソッドはawaitされるため、AsyncMockにする
+    mock.beta.chatkit.sessions.create = AsyncMock(return_value=mock_session)
+    return mock
 
 
 @pytest.fixture
-def mock_slack():
+def mock_slack(slack_patch):
     """Slack通知のモック"""
-    with patch('slack_notification.send_slack_notification') as mock:
-        mock.return_value = True
-        yield mock
+    mock = slack_patch
+    # 前のテストで積まれた通知が、このテストの呼び出しとして数えられないようにする
+    from slack_notification import wait_for_notifications
+    wait_for_notifications()
+    mock.reset_mock()
+    mock.return_value = True
+    return mock
 
 # TestClient: FastAPIのテスト用クライアント。appを渡すと、APIリクエストを送信できる。偽ブラウザ。サーバを立てすにテストできる (高速)
-# returnは値をテスト関数に渡しその時点で終了。後片づけなし。
-@pytest.fixture
-def client(mock_stripe, mock_openai, mock_slack): # 引数にfixtureを渡すと、順に呼び出される
-    """テスト用のFastAPIクライアント"""
-    # モックを適用してからサーバーをインポート
+# アプリのimportとTestClientの生成はセッション全体で1回だけ行う。
+# (serverはimport時に環境変数を読むため、モジュール読み込み時ではなくsetup_test_envの後でimportする)
+@pytest.fixture(scope="session")
+def session_client(setup_test_env, stripe_patch, openai_patch, slack_patch):
+    """セッション全体で共有するFastAPIクライアント"""
     from server import app
     return TestClient(app)
 
 
-@pytest.fixture(scope="function")
+# returnは値をテスト関数に渡しその時点で終了。後片づけなし。
+@pytest.fixture
+def client(session_client, mock_stripe, mock_openai, mock_slack): # 引数にfixtureを渡すと、順に呼び出される
+    """テスト用のFastAPIクライアント（モックはテストごとに初期状態に戻す）"""
+    return session_client
+
+
+class _TestTransactionConnection(psycopg2.extensions.connection):
+    """
+    テスト用の接続クラス
+    アプリ側のcommit/rollbackを本物のトランザクション操作ではなくセーブポイント操作に置き換え、
+    テスト中の書き込みをすべてテスト終了時のロールバックで取り消せるようにする
+    """
+    def commit(self):
+        with self.cursor() as cursor:
+            cursor.execute("RELEASE SAVEPOINT app; SAVEPOINT app")
+
+    def rollback(self):
+        with self.cursor() as cursor:
+            cursor.execute("ROLLBACK TO SAVEPOINT app")
+
+
+class _TestTransactionPool:
+    """
+    テスト用のコネクションプール
+    常に同じ接続を貸し出し、貸し出しごとにセーブポイントを作る
+    返却時はプールと同様に未コミットの変更を取り消す
+    """
+    def __init__(self, conn):
+        self.conn = conn
+
+    def getconn(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute("SAVEPOINT app")
+        return self.conn
+
+    def putconn(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute("ROLLBACK TO SAVEPOINT app; RELEASE SAVEPOINT app")
+
+
+@pytest.fixture(scope="session")
 def test_db():
-    """テスト用データベースのセットアップとクリーンアップ"""
-    from database import get_db_connection, get_db_cursor, init_database
+    """テスト用データベースのセットアップ（セッション全体で1回だけ）とクリーンアップ"""
+    from database import init_database
+    
+    if _XDIST_WORKER:
+        _create_worker_database()
     
     # データベースを初期化（テーブル作成とメニュー初期データの挿入）
     init_database()
     
-    # テスト用データベースに接続
-    conn = None
+    # テスト全体で共有する接続（commit/rollbackはセーブポイント操作になる）
+    conn = psycopg2.connect(**TEST_DB_CONFIG, connection_factory=_TestTransactionConnection)
     try:
-        conn = get_db_connection()
-        
         yield conn
-        
     finally:
-        # テストデータをクリーンアップ
-        if conn:
-            cursor = get_db_cursor(conn)
-            try:
-                cursor.execute("TRUNCATE TABLE reservation_menu_items CASCADE")
-                cursor.execute("TRUNCATE TABLE reservations CASCADE")
-                cursor.execute("TRUNCATE TABLE menus CASCADE")
-                cursor.execute("TRUNCATE TABLE users CASCADE")
-                conn.commit()
-            except Exception as e:
-                conn.rollback()
-                print(f"クリーンアップエラー: {e}")
-            finally:
-                cursor.close()
-                conn.close()
+        # テストデータをクリーンアップ（本物のcommitで確定させる）
+        cursor = conn.cursor()
+        try:
+            psycopg2.extensions.connection.rollback(conn)
+            cursor.execute(
+                "TRUNCATE TABLE reservation_menu_items, reservations, menus, users CASCADE"
+            )
+            psycopg2.extensions.connection.commit(conn)
+        except Exception as e:
+            print(f"クリーンアップエラー: {e}")
+        finally:
+            cursor.close()
+            conn.close()
 
 
 @pytest.fixture
-def test_user(client, test_db):
-    """テスト用ユーザーを作成"""
-    user_data = {
-        "email": "test@example.com",
-        "password": "testpassword123",
-        "name": "テストユーザー"
-    }
+def db_tx(test_db, monkeypatch):
+    """
+    テストごとのトランザクション
+    アプリとテストの接続をすべてtest_dbの接続に向け、テスト終了時にロールバックして
+    書き込みを取り消す（テーブルのTRUNCATEや再初期化は不要）
+    """
+    import database
     
+    monkeypatch.setattr(database, "_pool", _TestTransactionPool(test_db))
+    try:
+        yield test_db
+    finally:
+        # テスト中の変更をすべて取り消す（セーブポイントごとトランザクションを破棄）
+        psycopg2.extensions.connection.rollback(test_db)
+
+
+def _register_user(client, user_data: dict) -> dict:
+    """
+    ユーザーを登録し、テストで使う情報（ID・トークン・認証ヘッダー）をまとめて返す
+    
+    Args:
+        client: テストクライアント
+        user_data: 登録するユーザー情報（email, password, name）
+    
+    Returns:
+        dict: 登録したユーザー情報にid, token, headersを追加した辞書
+    """
     response = client.post("/api/auth/register", json=user_data)
     assert response.status_code == 200
     data = response.json()
@@ -153,14 +300,36 @@ def test_user(client, test_db):
     return {
         **user_data,
         "id": data["user"]["id"],
-        "token": data["access_token"]
+        "token": data["access_token"],
+        # 認証付きリクエストに使うヘッダー（テストごとに組み立て直さない）
+        "headers": {"Authorization": f"Bearer {data['access_token']}"},
     }
 
 
 @pytest.fixture
-def test_menu(test_db):
+def test_user(client, db_tx):
+    """テスト用ユーザーを作成"""
+    return _register_user(client, {
+        "email": "test@example.com",
+        "password": "testpassword123",
+        "name": "テストユーザー"
+    })
+
+
+@pytest.fixture
+def other_user(client, db_tx):
+    """test_userとは別のユーザーを作成（他のユーザーのデータにアクセスできないことの確認に使う）"""
+    return _register_user(client, {
+        "email": "user2@example.com",
+        "password": "password123",
+        "name": "ユーザー2"
+    })
+
+
+@pytest.fixture
+def test_menu(db_tx):
     """テスト用メニューを作成"""
-    from database import get_db_connection, get_db_cursor
+    from database import get_db_connection, get_db_cursor, release_db_connection
     
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
@@ -178,5 +347,74 @@ def test_menu(test_db):
         return dict(menu)
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
+
+
+
+@pytest.fixture
+def unavailable_menu(db_tx):
+    """テスト用の利用不可メニューを作成"""
+    # アプリと同じ接続（db_tx）に直接挿入する。テスト終了時のロールバックで取り消される
+    with db_tx.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO menus (name, description, price, is_available)
+            VALUES (%s, %s, %s, %s)
+            RETURNING id, name, description, price, is_available
+        """, ("利用不可メニュー", "テスト", 1000, False))
+        row = cursor.fetchone()
+    
+    return dict(zip(("id", "name", "description", "price", "is_available"), row))
+
 
+@pytest.fixture
+def created_reservation(client, test_user, test_menu, mock_stripe):
+    """テスト用ユーザーの予約（メニュー1件・決済済み）をAPI経由で作成"""
+    reservation_data = {
+        "reservation_date": _FUTURE,
+        "reservation_time": "18:00",
+        "number_of_people": 2,
+        "menu_items": [
+            {"menu_id": test_menu["id"], "quantity": 1}
+        ],
+        "payment_intent_id": "pi_test_123"
+    }
+    
+    headers = test_user["headers"]
+    response = client.post("/api/reservations", json=reservation_data, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.fixture
+def seed_reservations(db_tx):
+    """
+    予約をAPIを通さずにDBへ直接作成する関数を返す
+    一覧の並び順など、予約が複数必要なテストの準備に使う
+    """
+    def seed(user_id: int, reservations: list) -> list:
+        """
+        Args:
+            user_id: 予約するユーザーのID
+            reservations: 予約のリスト（reservation_date, reservation_time, number_of_peopleを持つ辞書）
+        
+        Returns:
+            list: 作成した予約のIDのリスト（引数と同じ順序）
+        """
+        with db_tx.cursor() as cursor:
+            # 引数と同じ順序でIDを返すため、1件ずつINSERTする（テスト用の接続なので往復は安い）
+            reservation_ids = []
+            for reservation in reservations:
+                cursor.execute("""
+                    INSERT INTO reservations (user_id, reservation_date, reservation_time, number_of_people)
+                    VALUES (%s, %s, %s, %s)
+                    RETURNING id
+                """, (
+                    user_id,
+                    reservation["reservation_date"],
+                    reservation["reservation_time"],
+                    reservation["number_of_people"],
+                ))
+                reservation_ids.append(cursor.fetchone()[0])
+            return reservation_ids
+    
+    return seed
@@ -0,0 +1,91 @@
+# CORS（オリジン間リソース共有）を処理するASGIミドルウェア
+# BaseHTTPMiddlewareを使わず、ASGIのメッセージを直接扱うことでリクエストごとのオブジェクト生成を省く
+# 応答ヘッダーは起動時に組み立てておき、リクエストごとにはオリジンの値だけを差し込む
+
+from typing import Iterable  # pyright: ignore[reportMissingImports]
+
+# 許可するHTTPメソッド（allow_methods=["*"]と同じ範囲）
+_ALLOW_METHODS = b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+# プリフライトの結果をブラウザがキャッシュしてよい秒数
+_MAX_AGE = b"600"
+
+
+class CORSMiddleware:
+    """
+    CORSヘッダーを付与するASGIミドルウェア
+
+    - Originヘッダーのないリクエスト（同一オリジン・サーバー間通信）は何もせずにアプリへ渡す
+    - プリフライト（OPTIONS + Access-Control-Request-Method）はアプリを通さずにその場で応答する
+    - それ以外はアプリの応答ヘッダーにCORSヘッダーを追加する
+    """
+
+    def __init__(self, app, allow_origins: Iterable[str], allow_credentials: bool = True):
+        """
+        Args:
+            app: 次に呼び出すASGIアプリケーション
+            allow_origins: 許可するオリジンのリスト（"*"ですべて許可）
+            allow_credentials: Cookieや認証ヘッダー付きのリクエストを許可するかどうか
+        """
+        self.app = app
+        origins = list(allow_origins)
+        self._allow_all_origins = "*" in origins
+        self._allow_origins = frozenset(origin.encode("latin-1") for origin in origins)
+        # 認証情報付きの場合、ブラウザは"*"を受け付けないため、リクエストのオリジンをそのまま返す
+        self._echo_origin = allow_credentials or not self._allow_all_origins
+
+        credentials_headers = [(b"access-control-allow-credentials", b"true")] if allow_credentials else []
+        self._simple_headers = [*credentials_headers, (b"vary", b"Origin")]
+        self._preflight_headers = [
+            *credentials_headers,
+            (b"access-control-allow-methods", _ALLOW_METHODS),
+            (b"access-control-max-age", _MAX_AGE),
+            (b"vary", b"Origin"),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        request_method = None
+        request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        is_preflight = scope["method"] == "OPTIONS" and request_method is not None
+        if not (self._allow_all_origins or origin in self._allow_origins):
+            if is_preflight:
+                # 許可していないオリジンからのプリフライトは拒否する
+                await send({"type": "http.response.start", "status": 400, "headers": [(b"content-type", b"text/plain; charset=utf-8")]})
+                await send({"type": "http.response.body", "body": b"Disallowed CORS origin"})
+                return
+            await self.app(scope, receive, send)
+            return
+
+        allow_origin = (b"access-control-allow-origin", origin if self._echo_origin else b"*")
+
+        if is_preflight:
+            headers = [allow_origin, *self._preflight_headers]
+            if request_headers:
+                # allow_headers=["*"]と同様に、要求されたヘッダーをそのまま許可する
+                headers.append((b"access-control-allow-headers", request_headers))
+            await send({"type": "http.response.start", "status": 204, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), allow_origin, *self._simple_headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
@@ -2,41 +2,167 @@
 # psycopg2を使用してPostgreSQLに接続
 
 import psycopg2  # PostgreSQL接続用ライブラリ
+import psycopg2.errors  # SQLSTATEごとの例外クラス
 from psycopg2.extras import RealDictCursor  # 結果を辞書形式で取得するためのカーソル
-import os  # 環境変数の取得に使用
-from dotenv import load_dotenv  # .envファイルから環境変数を読み込む
+from psycopg2.pool import ThreadedConnectionPool  # スレッドセーフなコネクションプール
+from contextlib import contextmanager  # with文で使えるコンテキストマネージャ用
+from functools import lru_cache  # EXECUTE文の文字列のキャッシュ用
+import threading  # プール生成・貸し出し数の排他制御用
+import weakref  # 接続ごとのプリペアドステートメント管理用（閉じた接続は自動で消える）
+import logging  # エラー・初期化メッセージのログ出力用
+from settings import DB_CONFIG, DB_POOL_MIN, DB_POOL_MAX  # 環境変数から読み込んだ接続設定
 
-# .envファイルから環境変数を読み込む
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# データベース接続情報を環境変数から取得
-# 環境変数が設定されていない場合はデフォルト値を使用
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", "localhost"),  # データベースホスト（デフォルト: localhost）
-    "port": os.getenv("DB_PORT", "5432"),  # データベースポート（デフォルト: 5432）
-    "database": os.getenv("DB_NAME", "ramen_restaurant"),  # データベース名（デフォルト: ramen_restaurant）
-    "user": os.getenv("DB_USER", "postgres"),  # データベースユーザー名（デフォルト: postgres）
-    "password": os.getenv("DB_PASSWORD", "postgres"),  # データベースパスワード（デフォルト: postgres）
-}
+# コネクションプール
+# リクエストごとにTCP接続・認証をやり直さず、確立済みの接続を使い回す
+# 接続情報（DB_CONFIG）とプールのサイズ（DB_POOL_MIN/DB_POOL_MAX）はsettingsで定義する
+
+# プール本体は最初に接続が必要になった時点で生成する（import時にDBへ接続しないため）
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPoolは上限を超えると即座に例外を投げるため、空きが出るまで待たせる
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+# 接続ごとにPREPARE済みのステートメント名を記録する
+# プリペアドステートメントはセッション単位でサーバー側に残る（ROLLBACKでも消えない）
+_prepared_statements = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+def get_db_pool() -> ThreadedConnectionPool:
+    """
+    コネクションプールを取得する関数（初回呼び出し時に生成）
+    
+    Returns:
+        ThreadedConnectionPool: プロセス内で共有するコネクションプール
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, **DB_CONFIG)
+    return _pool
 
 
 def get_db_connection():
     """
-    データベースへの接続を取得する関数
+    コネクションプールからデータベース接続を借りる関数
+    使い終わったら必ずrelease_db_connection()で返却すること
     
     Returns:
         psycopg2.connection: PostgreSQLデータベース接続オブジェクト
     """
+    _pool_slots.acquire()
     try:
-        # PostgreSQLに接続
-        conn = psycopg2.connect(**DB_CONFIG)
-        return conn
+        # プールから接続を借りる
+        return get_db_pool().getconn()
     except psycopg2.Error as e:
+        _pool_slots.release()
         # 接続エラーが発生した場合、エラーメッセージを出力
-        print(f"データベース接続エラー: {e}")
+        logger.error("データベース接続エラー: %s", e)
+        raise
+    except Exception:
+        _pool_slots.release()
         raise
 
 
+def release_db_connection(conn):
+    """
+    借りたデータベース接続をプールに返却する関数
+    未完了のトランザクションはプール側でロールバックされる
+    
+    Args:
+        conn: get_db_connection()で取得した接続
+    """
+    try:
+        get_db_pool().putconn(conn)
+    finally:
+        _pool_slots.release()
+
+
+def get_db():
+    """
+    FastAPIの依存関数として、プールから接続を借りる関数
+    同じリクエスト内では依存関数どうしで同じ接続が共有され、
+    エンドポイントの処理が終わると自動的にプールへ返却される
+    （同期のジェネレータなので、プールの空き待ちもスレッドプール側で行われイベントループを止めない）
+    
+    Yields:
+        psycopg2.connection: PostgreSQLデータベース接続オブジェクト
+    """
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        release_db_connection(conn)
+
+
+@contextmanager
+def db_cursor():
+    """
+    プールから接続を借り、辞書形式のカーソルを返すコンテキストマネージャ
+    withブロックを抜けるとカーソルを閉じて接続をプールに返却する
+    コミットが必要な場合は cursor.connection.commit() を呼ぶ
+    
+    Yields:
+        RealDictCursor: 辞書形式のカーソル
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            yield cursor
+    finally:
+        release_db_connection(conn)
+
+
+@lru_cache(maxsize=256)
+def _execute_sql(name: str, param_count: int) -> str:
+    """
+    プリペアドステートメントを実行するEXECUTE文を作る関数
+    ステートメント名と引数の数ごとに1回だけ組み立て、以降はキャッシュした文字列を使う
+    
+    Args:
+        name: ステートメント名
+        param_count: 引数の数
+    
+    Returns:
+        str: EXECUTE文（例: "EXECUTE name (%s, %s)"）
+    """
+    return f"EXECUTE {name} ({', '.join(['%s'] * param_count)})"
+
+
+def execute_prepared(cursor, name: str, statement: str, params: tuple):
+    """
+    サーバー側のプリペアドステートメントとしてSQLを実行する関数
+    接続ごとに初回だけPREPAREを送り、以降はEXECUTEだけを送って
+    PostgreSQL側のパースと実行計画の作成を省く
+    
+    PREPAREは単独で送り、成功した場合にだけ準備済みとして記録する
+    (EXECUTEと同じ往復で送ると、EXECUTEだけが失敗した場合にPREPAREが
+    成功したかどうかを区別できないため）
+    PREPAREはパラメータなしで実行するため、statement中の%はエスケープ不要
+    
+    Args:
+        cursor: 実行に使うカーソル
+        name: ステートメント名（接続内で一意にすること）
+        statement: $1, $2 ... 形式のプレースホルダを使ったSQL
+        params: プレースホルダに渡す値
+    """
+    conn = cursor.connection
+    with _prepared_lock:
+        prepared = _prepared_statements.setdefault(conn, set())
+        needs_prepare = name not in prepared
+    
+    if needs_prepare:
+        # 失敗した場合（テーブルが未作成、タイムアウト、トランザクションが失敗済みなど）は
+        # サーバー側にも作られていないため、記録せずに例外をそのまま呼び出し元に返す
+        cursor.execute(f"PREPARE {name} AS {statement}")
+        with _prepared_lock:
+            prepared.add(name)
+    cursor.execute(_execute_sql(name, len(params)), params)
+
+
 def init_database():
     """
     データベースのテーブルを初期化する関数
@@ -52,15 +178,20 @@ def init_database():
         # password_hash: パスワードのハッシュ値（セキュリティのため平文で保存しない）
         # name: ユーザー名
         # created_at: アカウント作成日時
-        cursor.execute("""
+        users_ddl = """
             CREATE TABLE IF NOT EXISTS users (
                 id SERIAL PRIMARY KEY,
                 email VARCHAR(255) UNIQUE NOT NULL,
                 password_hash VARCHAR(255) NOT NULL,
                 name VARCHAR(255) NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+            );
+            -- ログイン時の検索（get_user_by_email）をインデックスだけで完結させる（Index Only Scan）
+            CREATE UNIQUE INDEX IF NOT EXISTS users_email_covering
+                ON users (email) INCLUDE (id, name, password_hash, created_at);
+            -- Index Only Scanには可視性マップが最新である必要があるため、VACUUMを早めに走らせる
+            ALTER TABLE users SET (autovacuum_vacuum_scale_factor = 0.02);
+        """
         
         # メニューテーブルの作成
         # id: 主キー（SERIAL: 自動増分）
@@ -69,7 +200,7 @@ def init_database():
         # price: 価格（整数、単位は円）
         # image_url: 画像URL（任意）
         # is_available: 利用可能かどうか（デフォルト: true）
-        cursor.execute("""
+        menus_ddl = """
             CREATE TABLE IF NOT EXISTS menus (
                 id SERIAL PRIMARY KEY,
                 name VARCHAR(255) NOT NULL,
@@ -78,8 +209,8 @@ def init_database():
                 image_url VARCHAR(500),
                 is_available BOOLEAN DEFAULT TRUE,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+            );
+        """
         
         # 予約テーブルの作成（決済情報を追加）
         # id: 主キー（SERIAL: 自動増分）
@@ -93,7 +224,7 @@ def init_database():
         # amount: 決済金額（整数、単位は円）
         # payment_status: 決済ステータス（pending: 未決済、succeeded: 決済完了、refunded: 返金済み）
         # created_at: 予約作成日時
-        cursor.execute("""
+        reservations_ddl = """
             CREATE TABLE IF NOT EXISTS reservations (
                 id SERIAL PRIMARY KEY,
                 user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
@@ -106,14 +237,17 @@ def init_database():
                 amount INTEGER,
                 payment_status VARCHAR(50) DEFAULT 'pending',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+            );
+            -- 予約一覧（ユーザーごと、日時の降順）をインデックス順に読み出せるようにする
+            CREATE INDEX IF NOT EXISTS idx_reservations_user_date
+                ON reservations (user_id, reservation_date DESC, reservation_time DESC);
+        """
         
         # 予約メニュー関連テーブル（予約とメニューの多対多の関係）
         # reservation_id: 予約ID（外部キー）
         # menu_id: メニューID（外部キー）
         # quantity: 数量
-        cursor.execute("""
+        items_ddl = """
             CREATE TABLE IF NOT EXISTS reservation_menu_items (
                 id SERIAL PRIMARY KEY,
                 reservation_id INTEGER NOT NULL REFERENCES reservations(id) ON DELETE CASCADE,
@@ -121,40 +255,46 @@ def init_database():
                 quantity INTEGER NOT NULL CHECK (quantity > 0),
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 UNIQUE(reservation_id, menu_id)
-            )
-        """)
+            );
+        """
         
-        # メニューの初期データを挿入（既に存在する場合はスキップ）
-        cursor.execute("SELECT COUNT(*) FROM menus")
-        menu_count = cursor.fetchone()[0]
+        # メニューの初期データ（menusテーブルが空の場合のみ挿入）
+        menus_data = [
+            ("本格ラーメン", "長時間煮込んだ濃厚スープと、こだわりの麺が自慢の一杯。チャーシュー、味玉、ネギがたっぷりと盛り付けられています。", 850, "画像/ramen.png"),
+            ("特製丼", "ボリューム満点の特製丼。ご飯の上にたっぷりの具材をのせた、満足感のある一品です。", 750, "画像/don.png"),
+            ("特製唐揚げ", "ジューシーでサクサクの特製唐揚げ。秘伝のタレで味付けした、絶品サイドメニューです。", 550, "画像/karaage.png"),
+            ("ドリンク", "コーラ、オレンジジュース、お茶など、各種ドリンクをご用意しています。", 200, "画像/cola.png"),
+        ]
+        # menus.nameには一意制約がないため、ON CONFLICTではなくNOT EXISTSで空のときだけ挿入する
+        seed_sql = """
+            INSERT INTO menus (name, description, price, image_url)
+            SELECT v.name, v.description, v.price, v.image_url
+            FROM (VALUES {}) AS v(name, description, price, image_url)
+            WHERE NOT EXISTS (SELECT 1 FROM menus);
+        """.format(", ".join(["(%s, %s, %s, %s)"] * len(menus_data)))
         
-        if menu_count == 0:
-            # メニュー初期データを挿入
-            menus_data = [
-                ("本格ラーメン", "長時間煮込んだ濃厚スープと、こだわりの麺が自慢の一杯。チャーシュー、味玉、ネギがたっぷりと盛り付けられています。", 850, "画像/ramen.png"),
-                ("特製丼", "ボリューム満点の特製丼。ご飯の上にたっぷりの具材をのせた、満足感のある一品です。", 750, "画像/don.png"),
-                ("特製唐揚げ", "ジューシーでサクサクの特製唐揚げ。秘伝のタレで味付けした、絶品サイドメニューです。", 550, "画像/karaage.png"),
-                ("ドリンク", "コーラ、オレンジジュース、お茶など、各種ドリンクをご用意しています。", 200, "画像/cola.png"),
-            ]
-            
-            cursor.executemany(
-                "INSERT INTO menus (name, description, price, image_url) VALUES (%s, %s, %s, %s)",
-                menus_data
-            )
-            print("メニューの初期データを挿入しました")
+        # テーブル作成と初期データ投入を1回の往復でまとめて実行
+        # （psycopg2はセミコロン区切りの複数文を1回のexecuteで送れる）
+        cursor.execute(
+            "\n".join([users_ddl, menus_ddl, reservations_ddl, items_ddl, seed_sql]),
+            [value for menu in menus_data for value in menu]
+        )
+        # 複数文の場合、rowcountは最後の文（初期データのINSERT）の件数になる
+        if cursor.rowcount > 0:
+            logger.info("メニューの初期データを挿入しました")
         
         # 変更をコミット（データベースに反映）
         conn.commit()
-        print("データベーステーブルの初期化が完了しました")
+        logger.info("データベーステーブルの初期化が完了しました")
     except psycopg2.Error as e:
         # エラーが発生した場合、ロールバック（変更を取り消し）
         conn.rollback()
-        print(f"データベース初期化エラー: {e}")
+        logger.error("データベース初期化エラー: %s", e)
         raise
     finally:
-        # カーソルと接続を閉じる
+        # カーソルを閉じて接続をプールに返却
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 
 def get_db_cursor(conn):
@@ -3,48 +3,142 @@
 # osを使用。これで環境変数を取得。
 # dotenvを使用。これで.envファイルから環境変数を読み込む。
 
-from fastapi import FastAPI, Request, Depends, HTTPException, status  # pyright: ignore[reportMissingImports]
+from fastapi import FastAPI, Request, Response, Depends, HTTPException, status, BackgroundTasks  # pyright: ignore[reportMissingImports]
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials  # pyright: ignore[reportMissingImports]
-from openai import OpenAI  # pyright: ignore[reportMissingImports]
-from fastapi.middleware.cors import CORSMiddleware  # pyright: ignore[reportMissingImports]
-from pydantic import BaseModel, EmailStr  # pyright: ignore[reportMissingImports]
-from typing import Any, Dict, Optional, List  # pyright: ignore[reportMissingImports]
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient  # pyright: ignore[reportMissingImports]
+import httpx  # pyright: ignore[reportMissingImports]
+from fastapi.responses import ORJSONResponse  # pyright: ignore[reportMissingImports]
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, StringConstraints, TypeAdapter  # pyright: ignore[reportMissingImports]
+from typing import Annotated, Any, Awaitable, Callable, Dict, Optional, List  # pyright: ignore[reportMissingImports]
 from datetime import date, time  # pyright: ignore[reportMissingImports]
 import os  # pyright: ignore[reportMissingImports]
-from dotenv import load_dotenv  # pyright: ignore[reportMissingImports]
 import stripe  # pyright: ignore[reportMissingImports]
+import anyio.to_thread  # pyright: ignore[reportMissingImports]
+import atexit  # pyright: ignore[reportMissingImports]
+import logging  # pyright: ignore[reportMissingImports]
+import logging.handlers  # pyright: ignore[reportMissingImports]
+import queue  # pyright: ignore[reportMissingImports]
+import hashlib  # pyright: ignore[reportMissingImports]
+import orjson  # pyright: ignore[reportMissingImports]
+import threading  # pyright: ignore[reportMissingImports]
+from cachetools import TTLCache  # pyright: ignore[reportMissingImports]
+from contextlib import asynccontextmanager  # pyright: ignore[reportMissingImports]
+from psycopg2.extras import execute_values  # pyright: ignore[reportMissingImports]
 
 # 認証とデータベース関連のモジュールをインポート
 from auth import (
-    authenticate_user, create_user, create_access_token, 
-    verify_token, get_user_by_email
+    authenticate_user, create_user, create_access_token, get_user_by_token
 )  # pyright: ignore[reportMissingImports]
-from database import get_db_connection, get_db_cursor, init_database  # pyright: ignore[reportMissingImports]
+from database import get_db, get_db_connection, get_db_cursor, release_db_connection, init_database, execute_prepared  # pyright: ignore[reportMissingImports]
 from slack_notification import (
-    notify_reservation_confirmed, notify_reservation_cancelled
+    notify_reservation_confirmed, notify_reservation_cancelled, warm_up_slack_connection
 )  # pyright: ignore[reportMissingImports]
 
-# .envファイルから環境変数を読み込む
-load_dotenv()
+# .envファイルはsettingsモジュールの読み込み時に1回だけ読み込まれる
+import settings  # pyright: ignore[reportMissingImports]
+from cors import CORSMiddleware  # pyright: ignore[reportMissingImports]
+
+
+def _configure_logging() -> None:
+    """
+    アプリケーション全体のログ出力を設定する関数
+    リクエストを処理するスレッドではログをキューに入れるだけにし、
+    標準エラー出力への書き込みは別スレッド（QueueListener）で行う
+    """
+    root = logging.getLogger()
+    if any(isinstance(handler, logging.handlers.QueueHandler) for handler in root.handlers):
+        # モジュールが再読み込みされた場合は二重に設定しない
+        return
+    
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    # プロセス終了時にキューに残ったログを書き出してからスレッドを止める
+    atexit.register(listener.stop)
+    
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(settings.LOG_LEVEL)
+
+
+_configure_logging()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    アプリケーションの起動・終了時の処理
+    DBや外部APIを同期的に呼ぶエンドポイントはdefで定義しており、AnyIOのスレッドプールで実行される。
+    デフォルトの上限（40スレッド）では同時実行数が頭打ちになるため、設定値まで広げる
+    """
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    # 最初の予約通知が接続の確立を待たないよう、Slack Webhookへの接続を事前に張っておく
+    warm_up_slack_connection()
+    yield
+    # OpenAIクライアントを作成済みの場合は、保持している接続を閉じる
+    if _openai is not None:
+        await _openai.close()
+    # Stripe用のHTTPクライアントが保持している接続を閉じる
+    _stripe_http_client.close()
+    await _stripe_http_client.close_async()
+
 
 # FastAPIのインスタンスを作成。
-app = FastAPI()
+# レスポンスのJSON化は標準のjsonモジュールより高速なorjsonで行う
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # CORS設定（開発環境用）
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# 同一オリジンで配信する環境ではCORS_ORIGINSを空にし、ミドルウェアを通さないようにする
+# ミドルウェアを追加する場合はBaseHTTPMiddlewareではなく、純粋なASGIミドルウェアとして実装すること
+# CORSの応答ヘッダーは起動時に組み立てておき、プリフライトはアプリを通さずに応答する（cors.pyを参照）
+if settings.CORS_ORIGINS:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.CORS_ORIGINS,
+        allow_credentials=True,
+    )
 
-# OpenAIのインスタンスを作成。OpenAIのAPIキーを環境変数から取得。
-openai = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+# OpenAIのインスタンス。起動時ではなく最初に使うときに作成する（get_openaiを参照）
+_openai: Optional[AsyncOpenAI] = None
+
+
+def get_openai() -> AsyncOpenAI:
+    """
+    OpenAIのクライアントを取得する関数
+    初回呼び出し時にクライアントを作成し、以降は同じインスタンスを使い回す
+    （ワーカーの起動時にHTTPクライアントの初期化を行わず、APIキー未設定でも起動できるようにする）
+    
+    Returns:
+        AsyncOpenAI: OpenAIのクライアント
+    
+    Raises:
+        KeyError: 環境変数OPENAI_API_KEYが設定されていない場合
+    """
+    global _openai
+    if _openai is None:
+        # 非同期クライアントを使い、OpenAIの応答待ちの間にスレッドを占有しないようにする
+        # 同時に多数のセッションを作成しても詰まらないよう、接続数の上限を広げたHTTPクライアントを渡す
+        _openai = AsyncOpenAI(
+            api_key=os.environ["OPENAI_API_KEY"],
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+                timeout=httpx.Timeout(30.0),
+            ),
+        )
+    return _openai
 
 # StripeのAPIキーを環境変数から取得して設定
 # Stripe API: 決済処理を行うためのAPI。秘密鍵（sk_で始まる）をサーバー側で使用
 stripe.api_key = os.environ.get("STRIPE_SECRET_KEY", "")
+# StripeへのHTTP通信はプロセス全体で1つのhttpxクライアント（接続プール）を共有する
+# デフォルトのrequestsクライアントはスレッドごとにセッションを持つため、スレッドプールの各スレッドが別々にTLS接続を張ってしまう
+# エンドポイントは同期(def)でStripe APIを呼ぶので、同期メソッドを有効にする
+_stripe_http_client = stripe.HTTPXClient(timeout=30, allow_sync_methods=True)
+stripe.default_http_client = _stripe_http_client
+# Payment Intent作成時の固定パラメータ（リクエストごとに作り直さない）
+_PAYMENT_CURRENCY = "jpy"  # 通貨コード（日本円）
+_AUTOMATIC_PAYMENT_METHODS = {"enabled": True}  # 利用可能な決済方法を自動で有効化（PaymentElement向け）
 
 # HTTPBearerを使用してJWTトークンの認証を行う
 security = HTTPBearer()
@@ -87,44 +181,107 @@ async def api_health_check(request: Request):
 #     except Exception as e:
 #         print(f"データベース初期化エラー: {e}")
 
+# リクエストモデル共通の設定
+# extra="forbid": 定義外のキーは受け付けない（余分なキーの扱いを検証時に考えなくてよい）
+# frozen=True: 検証後に変更されないモデルとして扱う
+# str_max_length: 極端に長い文字列は検証の段階で弾く
+_REQUEST_MODEL_CONFIG = ConfigDict(extra="forbid", frozen=True, str_max_length=1024)
+
+# メールアドレスの形式（ローカル部@ドメイン.トップレベルドメイン）
+# email-validator（Pythonで1文字ずつ解析する）の代わりに、pydantic-core（Rust）の正規表現で検証する
+_EMAIL_PATTERN = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+
+def _normalize_email(value: str) -> str:
+    """メールアドレスのドメイン部分は大文字・小文字を区別しないため、小文字にそろえる"""
+    local_part, _, domain = value.rpartition("@")
+    return f"{local_part}@{domain.lower()}"
+
+
+# メールアドレス型（形式の検証とドメインの正規化を行う）
+EmailAddress = Annotated[str, StringConstraints(pattern=_EMAIL_PATTERN, max_length=254), AfterValidator(_normalize_email)]
+
+# ChatKitのウィジェットアクション
+class WidgetAction(BaseModel):
+    # ChatKitが付与するその他のキーは使わないので無視する
+    model_config = ConfigDict(extra="ignore", frozen=True, str_max_length=1024)
+    
+    type: str  # アクションタイプ（例: "ramen.faq"）
+    payload: Optional[Dict[str, Any]] = None  # アクションのデータ（jsonのキーは文字列）
+
 # リクエストボディのモデル定義
 class WidgetActionRequest(BaseModel):
-    # 型検査は型変換して通す可能性あり。
-    action: Dict[str, Any] # jsonのキーは文字列
+    model_config = _REQUEST_MODEL_CONFIG
+    
+    action: WidgetAction
     itemId: str
 
 # ユーザー登録用のリクエストモデル
 class UserRegister(BaseModel):
-    email: EmailStr  # メールアドレス（バリデーション付き）
+    model_config = _REQUEST_MODEL_CONFIG
+    
+    email: EmailAddress  # メールアドレス（バリデーション付き）
     password: str  # パスワード
     name: str  # ユーザー名
 
 # ログイン用のリクエストモデル
 class UserLogin(BaseModel):
-    email: EmailStr  # メールアドレス
+    model_config = _REQUEST_MODEL_CONFIG
+    
+    email: EmailAddress  # メールアドレス
     password: str  # パスワード
 
 # メニューアイテム用のリクエストモデル
 class MenuItemRequest(BaseModel):
+    model_config = _REQUEST_MODEL_CONFIG
+    
     menu_id: int  # メニューID
     quantity: int  # 数量
 
 # 予約作成用のリクエストモデル
 class ReservationCreate(BaseModel):
+    model_config = _REQUEST_MODEL_CONFIG
+    
     reservation_date: date  # 予約日
-    reservation_time: str  # 予約時間（文字列形式、例: "18:00"）
+    reservation_time: time  # 予約時間（"18:00"の形式で受け取り、リクエストの検証時にtimeへ変換する）
     number_of_people: int  # 人数
     special_requests: Optional[str] = None  # 特別な要望（任意）
-    menu_items: Optional[List[MenuItemRequest]] = []  # 選択されたメニューアイテム
+    menu_items: Optional[List[MenuItemRequest]] = Field(default_factory=list)  # 選択されたメニューアイテム
     payment_intent_id: Optional[str] = None  # StripeのPayment Intent ID
 
+# 予約に含まれるメニューのレスポンスモデル
+class ReservationMenuItemOut(BaseModel):
+    menu_id: int  # メニューID
+    name: str  # メニュー名
+    price: int  # 価格（円）
+    quantity: int  # 数量
+
+# 予約のレスポンスモデル（クライアントが使う項目だけを返す）
+# response_modelに指定すると、pydantic-coreの型付きシリアライザで直接JSONに変換される
+class ReservationOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int  # 予約ID
+    user_id: int  # 予約したユーザーのID
+    reservation_date: date  # 予約日
+    reservation_time: time  # 予約時間（"18:00:00"の形式で返す）
+    number_of_people: int  # 人数
+    special_requests: Optional[str] = None  # 特別な要望
+    status: Optional[str] = None  # 予約ステータス
+    amount: Optional[int] = None  # 決済金額（円）
+    payment_status: Optional[str] = None  # 決済ステータス
+    menu_items: List[ReservationMenuItemOut] = []  # 選択されたメニュー
+
 # 現在のユーザーを取得する依存関数。security(HttpBearerの返り値)を指定すると、Authorizarionヘッダーを見て、Bearer <token>の形式か判断し取り出す。
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """
     JWTトークンから現在のユーザー情報を取得する関数
     認証が必要なエンドポイントで使用
+    キャッシュにない場合はDBを検索するため、defで定義してスレッドプールで実行する（イベントループを止めない）
+    取得したユーザーはrequest.state.userにも保存し、ミドルウェアやログ出力から再検証せずに参照できるようにする
     
     Args:
+        request: リクエスト情報
         credentials: HTTPBearerから取得した認証情報
         credentials.scheme → "Bearer"
         credentials.credentials → トークン文字列(トークンのみ)
@@ -135,32 +292,15 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     Raises:
         HTTPException: トークンが無効な場合
     """
-    # トークンを検証
-    payload = verify_token(credentials.credentials)
-    email = payload.get("sub")  # トークンに含まれるメールアドレス
-    
-    if email is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="無効な認証情報です"
-        )
-    
-    # ユーザー情報を取得
-    user = get_user_by_email(email)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="ユーザーが見つかりません"
-        )
-    
-    # パスワードハッシュを返さないようにする
-    user.pop("password_hash", None)
+    # トークンを検証してユーザー情報を取得（成功した結果は短時間キャッシュされる）
+    user = get_user_by_token(credentials.credentials)
+    request.state.user = user
     return user
 
 # /api/chatkit/session にPOSTリクエストが来た時の処理。
 @app.post("/api/chatkit/session")
-def create_chatkit_session(): 
-    session = openai.beta.chatkit.sessions.create(
+async def create_chatkit_session(): 
+    session = await get_openai().beta.chatkit.sessions.create(
       user="user",
       workflow={
         "id": "wf_695209dd2a188190a99acf5b73ee77d809b3b904f6ee188e"
@@ -182,21 +322,16 @@ async def widget_action(request: WidgetActionRequest):
     2. FastAPIのRequestを使用してリクエストを受け取り、request.json()jsonを読み取ってpythonの型に変換。
     """
     action = request.action
-    item_id = request.itemId
-    action_type = action.get("type") 
-    action_payload = action.get("payload") 
-    
-    # アクションタイプに応じた処理
-    if action_type == "ramen.faq":
-        # 例: アクションIDを取得して処理
-        action_id = action_payload.get("id") if isinstance(action_payload, dict) else None
-        response = await do_thing(action_id)
-        
-        print(response);
-        return {"response":response}
-    else:
+    
+    # アクションタイプに応じた処理を対応表から取得
+    handler = _WIDGET_ACTION_HANDLERS.get(action.type)
+    if handler is None:
         # その他のアクションタイプ
         return {"response":"NG"}
+    
+    response = await handler(action.payload)
+    logger.debug("widget action response=%s", response)
+    return {"response":response}
 
 async def do_thing(action_id: Optional[str]):
     """
@@ -209,6 +344,28 @@ async def do_thing(action_id: Optional[str]):
     """
     return action_id
 
+
+async def _handle_faq(payload: Optional[Dict[str, Any]]):
+    """
+    FAQアクション（ramen.faq）の処理
+    
+    Args:
+        payload: アクションのデータ（idキーにアクションIDを含む）
+    
+    Returns:
+        処理結果
+    """
+    # 例: アクションIDを取得して処理
+    action_id = payload.get("id") if payload else None
+    return await do_thing(action_id)
+
+
+# アクションタイプ → 処理関数の対応表
+# アクションタイプを追加する場合は、処理関数を定義してここに登録する
+_WIDGET_ACTION_HANDLERS: Dict[str, Callable[[Optional[Dict[str, Any]]], Awaitable[Any]]] = {
+    "ramen.faq": _handle_faq,
+}
+
 # ========== 認証関連のAPIエンドポイント ==========
 
 @app.post("/api/auth/register")
@@ -225,16 +382,8 @@ async def register(user_data: UserRegister):
         dict: 作成されたユーザー情報とアクセストークン
     """
     try:
-        # 事前にメールアドレスの重複をチェック（DBエラーに依存しないようにする）
-        existing_user = get_user_by_email(user_data.email)
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="このメールアドレスは既に登録されています",
-            )
-
-        # ユーザーを作成
-        user = create_user(user_data.email, user_data.password, user_data.name)
+        # ユーザーを作成（メールアドレスの重複はINSERT時に判定される）
+        user = await create_user(user_data.email, user_data.password, user_data.name)
 
         # アクセストークンを生成
         access_token = create_access_token(data={"sub": user["email"]})
@@ -270,7 +419,7 @@ async def login(user_data: UserLogin):
     """
     try:
         # ユーザー認証
-        user = authenticate_user(user_data.email, user_data.password)
+        user = await authenticate_user(user_data.email, user_data.password)
         
         # アクセストークンを生成
         access_token = create_access_token(data={"sub": user["email"]})
@@ -302,18 +451,57 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     """
     return current_user
 
+
+def _make_etag(body: bytes) -> str:
+    """
+    レスポンスのJSONからETag（強いETag）を作る関数
+    
+    Args:
+        body: レスポンスのJSON
+    
+    Returns:
+        str: ETag（ダブルクォートで囲んだハッシュ値）
+    """
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def _etag_response(request: Request, body: bytes, etag: str, cache_control: Optional[str] = None) -> Response:
+    """
+    ETag付きのJSONレスポンスを返す関数
+    If-None-MatchがETagと一致する場合は、本文を送らずに304を返す
+    
+    Args:
+        request: リクエスト情報（If-None-Matchヘッダーの確認に使用）
+        body: レスポンスのJSON
+        etag: bodyのETag
+        cache_control: Cache-Controlヘッダーの値（指定しない場合は付けない）
+    
+    Returns:
+        Response: JSONレスポンス（変更がない場合は304）
+    """
+    headers = {"ETag": etag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # ========== メニュー関連のAPIエンドポイント ==========
 
 @app.get("/api/stripe/publishable-key")
-async def get_stripe_publishable_key():
+async def get_stripe_publishable_key(request: Request):
     """
     Stripe公開可能キーを取得するエンドポイント
     
     Stripe API: クライアント側でStripe.jsを使用する際に必要な公開可能キー（pk_で始まる）
     を返す。秘密鍵（sk_で始まる）とは異なり、クライアント側に公開しても安全。
+    キーはほとんど変わらないため、ブラウザに1時間キャッシュさせる
+    
+    Args:
+        request: リクエスト情報（If-None-Matchヘッダーの確認に使用）
     
     Returns:
-        dict: Stripe公開可能キー
+        Response: Stripe公開可能キー（変更がない場合は304）
     """
     publishable_key = os.environ.get("STRIPE_PUBLISHABLE_KEY", "")
     if not publishable_key:
@@ -321,31 +509,60 @@ async def get_stripe_publishable_key():
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Stripe公開可能キーが設定されていません"
         )
-    return {"publishable_key": publishable_key}
+    body = orjson.dumps({"publishable_key": publishable_key})
+    return _etag_response(request, body, _make_etag(body), "public, max-age=3600")
 
 
 @app.get("/api/menus")
-async def get_menus():
+def get_menus(request: Request):
     """
     利用可能なメニュー一覧を取得するエンドポイント
+    一覧のJSONとETagはメニューのキャッシュと一緒に保持し、ブラウザにも60秒キャッシュさせる
+    
+    Args:
+        request: リクエスト情報（If-None-Matchヘッダーの確認に使用）
+    
+    Returns:
+        Response: メニュー一覧（変更がない場合は304）
+    """
+    _available_menus, _menus_by_id, body, etag = _get_menus()
+    return _etag_response(request, body, etag, "public, max-age=60")
+
+
+# メニューのキャッシュ（"all" → (利用可能なメニューのリスト, メニューID → メニュー情報, 一覧のJSON, ETag)）
+# メニューはほとんど変更されないため、一覧表示と決済金額の計算で毎回DBに問い合わせないようにする
+_MENU_CACHE = TTLCache(maxsize=1, ttl=60)
+_MENU_CACHE_LOCK = threading.Lock()
+
+
+def _get_menus() -> tuple:
+    """
+    メニュー情報をキャッシュから取得する関数（キャッシュにない場合はDBから読み込む）
     
     Returns:
-        list: メニュー一覧
+        tuple: (利用可能なメニューのリスト, メニューID → メニュー情報（利用不可のものを含む）, 一覧のJSON, 一覧のETag)
+    
+    Raises:
+        HTTPException: メニューの取得に失敗した場合
     """
+    with _MENU_CACHE_LOCK:
+        cached = _MENU_CACHE.get("all")
+    if cached is not None:
+        return cached
+    
     conn = get_db_connection()
     cursor = get_db_cursor(conn)
     
     try:
+        # 利用不可のメニューも読み込み、決済時に「現在利用できません」と返せるようにする
         cursor.execute(
             """
             SELECT id, name, description, price, image_url, is_available
             FROM menus
-            WHERE is_available = TRUE
             ORDER BY id
             """
         )
         menus = cursor.fetchall()
-        return [dict(menu) for menu in menus]
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -353,13 +570,25 @@ async def get_menus():
         )
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
+    
+    available_menus = [menu for menu in menus if menu["is_available"]]
+    body = orjson.dumps(available_menus)
+    cached = (
+        available_menus,
+        {menu["id"]: menu for menu in menus},
+        body,
+        _make_etag(body),
+    )
+    with _MENU_CACHE_LOCK:
+        _MENU_CACHE["all"] = cached
+    return cached
 
 
 # ========== 決済関連のAPIエンドポイント ==========
 
 @app.post("/api/payments/create-intent")
-async def create_payment_intent(
+def create_payment_intent(
     menu_items: List[MenuItemRequest],
     current_user: dict = Depends(get_current_user)
 ):
@@ -382,46 +611,33 @@ async def create_payment_intent(
             detail="Stripe APIキーが設定されていません"
         )
     
-    conn = get_db_connection()
-    cursor = get_db_cursor(conn)
-    
     try:
         # メニュー情報を取得して合計金額を計算
         total_amount = 0
-        menu_ids = [item.menu_id for item in menu_items]
         
-        if not menu_ids:
+        if not menu_items:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="メニューが選択されていません"
             )
         
-        # メニュー情報を取得
-        placeholders = ','.join(['%s'] * len(menu_ids))
-        cursor.execute(
-            f"""
-            SELECT id, name, price, is_available
-            FROM menus
-            WHERE id IN ({placeholders})
-            """,
-            menu_ids
-        )
-        # id: メニュー情報
-        menus = {menu['id']: menu for menu in cursor.fetchall()}
+        # メニュー情報（id: メニュー情報）はキャッシュから取得し、DBへの問い合わせを省く
+        _available_menus, menus, _body, _etag = _get_menus()
         
-        # 合計金額を計算
+        # 合計金額を計算（メニューの検索はアイテムごとに1回だけ行う）
         for item in menu_items:
-            if item.menu_id not in menus:
+            menu = menus.get(item.menu_id)
+            if menu is None:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"メニューID {item.menu_id} が見つかりません"
                 )
-            if not menus[item.menu_id]['is_available']:
+            if not menu['is_available']:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"メニュー「{menus[item.menu_id]['name']}」は現在利用できません"
+                    detail=f"メニュー「{menu['name']}」は現在利用できません"
                 )
-            total_amount += menus[item.menu_id]['price'] * item.quantity
+            total_amount += menu['price'] * item.quantity
         
         if total_amount <= 0:
             raise HTTPException(
@@ -431,15 +647,12 @@ async def create_payment_intent(
         
         # Stripe Payment Intentを作成
         # amountは最小通貨単位（日本円の場合は円単位）
-        # currency: 通貨コード（'jpy'は日本円）
-        # automatic_payment_methods: 利用可能な決済方法を自動で有効化（PaymentElement向け）
+        # currency, automatic_payment_methods: モジュールの定数を使い回す
         # metadata: 追加情報（ユーザーIDやメニュー情報などを保存可能）
         payment_intent = stripe.PaymentIntent.create(
             amount=total_amount,  # 金額（日本円の場合は円単位）
-            currency='jpy',  # 通貨コード
-            automatic_payment_methods={
-                'enabled': True,
-            },
+            currency=_PAYMENT_CURRENCY,
+            automatic_payment_methods=_AUTOMATIC_PAYMENT_METHODS,
             metadata={
                 'user_id': str(current_user['id']),
                 'user_email': current_user['email']
@@ -461,13 +674,10 @@ async def create_payment_intent(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"決済処理中にエラーが発生しました: {str(e)}",
         )
-    finally:
-        cursor.close()
-        conn.close()
 
 
 @app.post("/api/payments/refund/{payment_intent_id}")
-async def refund_payment(
+def refund_payment(
     payment_intent_id: str,
     current_user: dict = Depends(get_current_user)
 ):
@@ -495,11 +705,13 @@ async def refund_payment(
     
     try:
         # 予約が存在し、ユーザーが所有しているか確認
-        cursor.execute(
+        execute_prepared(
+            cursor,
+            "get_reservation_by_payment_intent",
             """
             SELECT id, payment_intent_id, payment_status, amount
             FROM reservations
-            WHERE payment_intent_id = %s AND user_id = %s
+            WHERE payment_intent_id = $1 AND user_id = $2
             """,
             (payment_intent_id, current_user["id"])
         )
@@ -511,57 +723,37 @@ async def refund_payment(
                 detail="予約が見つかりません"
             )
         
-        reservation_dict = dict(reservation)
-        
-        # 既に返金済みか確認
-        if reservation_dict['payment_status'] == 'refunded':
+        # 既に返金済みか確認（RealDictCursorの行はdictとしてそのまま参照できる）
+        if reservation['payment_status'] == 'refunded':
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="既に返金済みです"
             )
         
-        # Payment Intentを取得して返金
-        # Stripe API: Payment Intentを取得して、そのCharge IDを取得
-        payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
-        
         # 決済が完了しているか確認
-        if payment_intent.status != 'succeeded':
+        # 予約作成時にStripeで決済完了を確認してsucceededを保存しているため、ここではAPIを呼ばない
+        if reservation['payment_status'] != 'succeeded':
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="決済が完了していないため返金できません"
             )
         
-        # Charge IDを取得（返金に必要）
-        charge_id = payment_intent.latest_charge
-        if not charge_id:
-            # latest_chargeが文字列の場合
-            if isinstance(payment_intent.latest_charge, str):
-                charge_id = payment_intent.latest_charge
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Charge IDが見つかりません"
-                )
-        
         # Refundを作成（全額返金）
-        # Stripe API: Refund.create()で返金処理を実行
-        # charge: 返金するCharge ID
-        # amount: 返金額（指定しない場合は全額返金）
-        refund = stripe.Refund.create(
-            charge=charge_id,
-            # amountを指定しない場合は全額返金
-        )
+        refund = _refund_payment_intent(payment_intent_id)
         
         # 予約の決済ステータスを更新
-        cursor.execute(
+        execute_prepared(
+            cursor,
+            "mark_reservation_refunded",
             """
             UPDATE reservations
             SET payment_status = 'refunded'
-            WHERE id = %s
+            WHERE id = $1
             """,
-            (reservation_dict['id'],)
+            (reservation['id'],)
         )
         conn.commit()
+        _invalidate_reservations_cache(current_user["id"])
         
         return {
             'refund_id': refund.id,
@@ -582,15 +774,198 @@ async def refund_payment(
         )
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
 
 
 # ========== 予約関連のAPIエンドポイント ==========
 
-@app.post("/api/reservations")
-async def create_reservation(
+# 予約の列（RETURNINGやSELECTで共通して使う）
+_RESERVATION_COLUMNS = "id, user_id, reservation_date, reservation_time, number_of_people, special_requests, status, payment_intent_id, amount, payment_status, created_at"
+
+# 予約一覧のキャッシュ（ユーザーID → (ETag, レスポンスのJSON)）
+# 画面遷移のたびに同じ一覧を取得するため、短時間はDBへの問い合わせとJSON化を省く
+# 予約の作成・キャンセル・返金時にはそのユーザーの分を削除する（他のワーカーのキャッシュは期限切れで更新される）
+_RESERVATIONS_CACHE = TTLCache(maxsize=10_000, ttl=5)
+_RESERVATIONS_CACHE_LOCK = threading.Lock()  # 同期エンドポイントは複数スレッドで実行される
+# ユーザーごとのキャッシュ削除の回数（ユーザーID → 回数）
+# 一覧の取得中に予約が変更された場合、取得した古い一覧をキャッシュに戻さないために使う
+_RESERVATIONS_GENERATION = {}
+_RESERVATION_LIST_ADAPTER = TypeAdapter(List[ReservationOut])
+
+
+def _invalidate_reservations_cache(user_id: int) -> None:
+    """
+    ユーザーの予約一覧のキャッシュを削除する関数
+    
+    Args:
+        user_id: ユーザーID
+    """
+    with _RESERVATIONS_CACHE_LOCK:
+        _RESERVATIONS_CACHE.pop(user_id, None)
+        _RESERVATIONS_GENERATION[user_id] = _RESERVATIONS_GENERATION.get(user_id, 0) + 1
+
+
+# 決済完了したPayment Intentのキャッシュ（Payment Intent ID → Payment Intent）
+# 再送やダブルクリックで同じPayment Intentを続けて確認する場合に、Stripe APIの呼び出しを省く
+# 状態が変わりうる未完了のPayment Intentはキャッシュしない
+_PAYMENT_INTENT_CACHE = TTLCache(maxsize=2000, ttl=30)
+_PAYMENT_INTENT_CACHE_LOCK = threading.Lock()
+
+
+def _retrieve_payment_intent(payment_intent_id: str):
+    """
+    Payment Intentを取得する関数（決済完了したものは30秒間キャッシュする）
+    
+    Args:
+        payment_intent_id: StripeのPayment Intent ID
+    
+    Returns:
+        stripe.PaymentIntent: Payment Intent
+    """
+    with _PAYMENT_INTENT_CACHE_LOCK:
+        payment_intent = _PAYMENT_INTENT_CACHE.get(payment_intent_id)
+    if payment_intent is not None:
+        return payment_intent
+    
+    # Stripe API: Payment Intentの状態を取得
+    payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+    if payment_intent.status == 'succeeded':
+        with _PAYMENT_INTENT_CACHE_LOCK:
+            _PAYMENT_INTENT_CACHE[payment_intent_id] = payment_intent
+    return payment_intent
+
+
+def _forget_payment_intent(payment_intent_id: str) -> None:
+    """
+    返金したPayment Intentをキャッシュから削除する関数
+    
+    Args:
+        payment_intent_id: StripeのPayment Intent ID
+    """
+    with _PAYMENT_INTENT_CACHE_LOCK:
+        _PAYMENT_INTENT_CACHE.pop(payment_intent_id, None)
+
+
+def _refund_payment_intent(payment_intent_id: str):
+    """
+    Payment Intentを全額返金する関数
+    
+    Stripe API: Refund.create()にPayment Intent IDを直接渡すと、Charge IDを調べるための
+    PaymentIntent.retrieve()を呼ばずに返金できる（金額を指定しない場合は全額返金）。
+    冪等キーをPayment Intentごとに固定し、再送やキャンセルと返金APIの重複でも二重に返金しない。
+    
+    Args:
+        payment_intent_id: StripeのPayment Intent ID
+    
+    Returns:
+        stripe.Refund: 作成された返金
+    """
+    refund = stripe.Refund.create(
+        payment_intent=payment_intent_id,
+        idempotency_key=f"refund-{payment_intent_id}",
+    )
+    _forget_payment_intent(payment_intent_id)
+    return refund
+
+
+def _verify_payment(payment_intent_id: Optional[str]) -> tuple:
+    """
+    予約に紐づく決済が完了しているか確認する関数
+    
+    Args:
+        payment_intent_id: StripeのPayment Intent ID（未指定の場合は決済なし）
+    
+    Returns:
+        tuple: (決済ステータス, 決済金額)
+    
+    Raises:
+        HTTPException: Stripeが未設定の場合、または決済が完了していない場合
+    """
+    if not payment_intent_id:
+        return 'pending', None
+    
+    if not stripe.api_key:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Stripe APIキーが設定されていません"
+        )
+    
+    # Stripe API: Payment Intentの状態を確認
+    # statusが'succeeded'の場合、決済が完了している
+    payment_intent = _retrieve_payment_intent(payment_intent_id)
+    
+    if payment_intent.status != 'succeeded':
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="決済が完了していません"
+        )
+    
+    return 'succeeded', payment_intent.amount
+
+
+def _fetch_menu_items(cursor, reservation_ids: List[int]) -> Dict[int, list]:
+    """
+    複数の予約のメニュー情報を1回のクエリでまとめて取得する関数
+    
+    Args:
+        cursor: 実行に使うカーソル
+        reservation_ids: 予約IDのリスト
+    
+    Returns:
+        dict: 予約ID → メニュー情報のリスト（menu_idキーを含む形式）
+    """
+    menu_items = {reservation_id: [] for reservation_id in reservation_ids}
+    execute_prepared(
+        cursor,
+        "get_reservation_menu_items",
+        """
+        SELECT rmi.reservation_id, m.id, m.name, m.price, rmi.quantity
+        FROM reservation_menu_items rmi
+        INNER JOIN menus m ON m.id = rmi.menu_id
+        WHERE rmi.reservation_id = ANY($1::int[])
+        ORDER BY rmi.id
+        """,
+        (list(reservation_ids),)
+    )
+    for item in cursor.fetchall():
+        menu_items[item["reservation_id"]].append({
+            "menu_id": item["id"],
+            "name": item["name"],
+            "price": item["price"],
+            "quantity": item["quantity"],
+        })
+    return menu_items
+
+
+def _notify_confirmed(background_tasks: BackgroundTasks, reservation: dict, current_user: dict) -> None:
+    """
+    予約確定のSlack通知をレスポンス送信後に実行するよう登録する関数
+    
+    Args:
+        background_tasks: レスポンス送信後に実行する処理
+        reservation: 作成された予約情報
+        current_user: 予約したユーザー情報
+    """
+    background_tasks.add_task(
+        notify_reservation_confirmed,
+        reservation_id=reservation["id"],
+        user_name=current_user["name"],
+        user_email=current_user["email"],
+        reservation_date=str(reservation["reservation_date"]),
+        reservation_time=str(reservation["reservation_time"]),
+        number_of_people=reservation["number_of_people"],
+        special_requests=reservation.get("special_requests"),
+        menu_items=reservation.get("menu_items")
+    )
+
+
+# response_model_exclude_unset: メニューを指定しなかった予約ではmenu_itemsを返さない（従来と同じ形）
+@app.post("/api/reservations", response_model=ReservationOut, response_model_exclude_unset=True)
+def create_reservation(
     reservation_data: ReservationCreate,
-    current_user: dict = Depends(get_current_user)
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+    conn = Depends(get_db)
 ):
     """
     予約を作成するエンドポイント
@@ -600,124 +975,182 @@ async def create_reservation(
     
     Args:
         reservation_data: 予約情報（日付、時間、人数、特別な要望、メニュー、決済情報）
+        background_tasks: レスポンス送信後に実行する処理（Slack通知）
         current_user: 認証されたユーザー情報
+        conn: データベース接続（依存関数get_dbから取得）
     
     Returns:
         dict: 作成された予約情報
     """
-    conn = get_db_connection()
     cursor = get_db_cursor(conn)
     
     try:
         # Payment Intentが指定されている場合、決済が完了しているか確認
-        payment_status = 'pending'
-        amount = None
-        
-        if reservation_data.payment_intent_id:
-            if not stripe.api_key:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Stripe APIキーが設定されていません"
-                )
-            
-            # Stripe API: Payment Intentの状態を確認
-            # statusが'succeeded'の場合、決済が完了している
-            payment_intent = stripe.PaymentIntent.retrieve(reservation_data.payment_intent_id)
-            
-            if payment_intent.status != 'succeeded':
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="決済が完了していません"
-                )
-            
-            payment_status = 'succeeded'
-            amount = payment_intent.amount
-        
-        # 予約時間を文字列からtimeオブジェクトに変換
-        reservation_time_obj = time.fromisoformat(reservation_data.reservation_time)
+        payment_status, amount = _verify_payment(reservation_data.payment_intent_id)
         
-        # 予約をデータベースに挿入
-        cursor.execute(
+        # 予約とメニューアイテムを1つの文で挿入する（DBとの往復は1回）
+        # メニューアイテムは配列で渡し、unnestで行に展開して新しい予約のIDと組み合わせる
+        # プリペアドステートメントで実行計画を使い回す
+        menu_items = reservation_data.menu_items or []
+        execute_prepared(
+            cursor,
+            "create_reservation",
             """
-            INSERT INTO reservations (user_id, reservation_date, reservation_time, number_of_people, special_requests, payment_intent_id, amount, payment_status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id, user_id, reservation_date, reservation_time, number_of_people, special_requests, status, payment_intent_id, amount, payment_status, created_at
+            WITH new_reservation AS (
+                INSERT INTO reservations (user_id, reservation_date, reservation_time, number_of_people, special_requests, payment_intent_id, amount, payment_status)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                RETURNING """ + _RESERVATION_COLUMNS + """
+            ), new_menu_items AS (
+                INSERT INTO reservation_menu_items (reservation_id, menu_id, quantity)
+                SELECT new_reservation.id, item.menu_id, item.quantity
+                FROM new_reservation, unnest($9::int[], $10::int[]) AS item(menu_id, quantity)
+            )
+            SELECT * FROM new_reservation
             """,
             (
                 current_user["id"],
                 reservation_data.reservation_date,
-                reservation_time_obj,
+                reservation_data.reservation_time,
                 reservation_data.number_of_people,
                 reservation_data.special_requests,
                 reservation_data.payment_intent_id,
                 amount,
-                payment_status
+                payment_status,
+                [menu_item.menu_id for menu_item in menu_items],
+                [menu_item.quantity for menu_item in menu_items],
             )
         )
         
         reservation = cursor.fetchone()
-        reservation_dict = dict(reservation)
-        reservation_id = reservation_dict["id"]
-        
-        # メニューアイテムを挿入
-        if reservation_data.menu_items:
-            for menu_item in reservation_data.menu_items:
-                cursor.execute(
-                    """
-                    INSERT INTO reservation_menu_items (reservation_id, menu_id, quantity)
-                    VALUES (%s, %s, %s)
-                    """,
-                    (reservation_id, menu_item.menu_id, menu_item.quantity)
-                )
+        reservation_id = reservation["id"]
         
         conn.commit()
-        
-        # 時間を文字列に変換して返す
-        if reservation_dict["reservation_time"]:
-            reservation_dict["reservation_time"] = str(reservation_dict["reservation_time"])
+        _invalidate_reservations_cache(current_user["id"])
         
         # メニュー情報を取得して追加
         if reservation_data.menu_items:
-            menu_ids = [item.menu_id for item in reservation_data.menu_items]
-            placeholders = ','.join(['%s'] * len(menu_ids))
-            cursor.execute(
-                f"""
-                SELECT m.id, m.name, m.price, rmi.quantity
-                FROM menus m
-                INNER JOIN reservation_menu_items rmi ON m.id = rmi.menu_id
-                WHERE rmi.reservation_id = %s AND m.id IN ({placeholders})
-                """,
-                [reservation_id] + menu_ids
+            reservation["menu_items"] = _fetch_menu_items(cursor, [reservation_id])[reservation_id]
+        
+        # Slackに予約確定通知を送信（レスポンス送信後に通知をキューに積み、送信は通知用のスレッドで行う）
+        # 通知のエラーは通知側でログに記録され、予約処理自体は成功とする
+        _notify_confirmed(background_tasks, reservation, current_user)
+        
+        # 日付・時間はresponse_modelのシリアライザが文字列にするので、行をそのまま返す
+        return reservation
+    except HTTPException:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"予約の作成に失敗しました: {str(e)}"
+        )
+    finally:
+        # 接続の返却は依存関数(get_db)が行う
+        cursor.close()
+
+
+# 一括作成で1回に受け付ける予約の上限
+# 予約ごとにStripeへの決済確認を順番に行い、その間DB接続とトランザクションを保持し続けるため
+_MAX_BULK_RESERVATIONS = 20
+
+
+@app.post("/api/reservations/bulk", response_model=List[ReservationOut], response_model_exclude_unset=True)
+def create_reservations_bulk(
+    reservations_data: List[ReservationCreate],
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+    conn = Depends(get_db)
+):
+    """
+    複数の予約をまとめて作成するエンドポイント
+    
+    予約はUNNESTで列ごとの配列として渡し、1回のINSERTでまとめて挿入します。
+    いずれかの予約でエラーが発生した場合は、すべての予約を作成しません。
+    
+    Args:
+        reservations_data: 予約情報のリスト
+        background_tasks: レスポンス送信後に実行する処理（Slack通知）
+        current_user: 認証されたユーザー情報
+        conn: データベース接続（依存関数get_dbから取得）
+    
+    Returns:
+        list: 作成された予約情報のリスト（リクエストと同じ順序）
+    """
+    if not reservations_data:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="予約が指定されていません"
+        )
+    if len(reservations_data) > _MAX_BULK_RESERVATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"一度に作成できる予約は{_MAX_BULK_RESERVATIONS}件までです"
+        )
+    
+    cursor = get_db_cursor(conn)
+    
+    try:
+        # 各予約の決済を確認し、列ごとの配列にまとめる
+        payments = [_verify_payment(data.payment_intent_id) for data in reservations_data]
+        
+        # IDを先に採番して入力の位置（ordinality）と対応づけ、挿入結果をリクエストと同じ順序で返す
+        # (INSERT ... RETURNINGの行の順序や採番の順序には保証がないため）
+        cursor.execute(
+            """
+            WITH input AS (
+                SELECT nextval(pg_get_serial_sequence('reservations', 'id')) AS id, r.*
+                FROM unnest(%s::date[], %s::time[], %s::int[], %s::text[], %s::text[], %s::int[], %s::text[])
+                    WITH ORDINALITY AS r(reservation_date, reservation_time, number_of_people, special_requests, payment_intent_id, amount, payment_status, ord)
+            ), inserted AS (
+                INSERT INTO reservations (id, user_id, reservation_date, reservation_time, number_of_people, special_requests, payment_intent_id, amount, payment_status)
+                SELECT id, %s, reservation_date, reservation_time, number_of_people, special_requests, payment_intent_id, amount, payment_status
+                FROM input
+                RETURNING """ + _RESERVATION_COLUMNS + """
             )
-            menu_items = cursor.fetchall()
-            # テスト仕様に合わせて menu_id キーを含む形で返却する
-            reservation_dict["menu_items"] = [
-                {
-                    "menu_id": item["id"],
-                    "name": item["name"],
-                    "price": item["price"],
-                    "quantity": item["quantity"],
-                }
-                for item in menu_items
-            ]
-        
-        # Slackに予約確定通知を送信（非同期で実行、エラーが発生しても予約処理は続行）
-        try:
-            notify_reservation_confirmed(
-                reservation_id=reservation_dict["id"],
-                user_name=current_user["name"],
-                user_email=current_user["email"],
-                reservation_date=str(reservation_dict["reservation_date"]),
-                reservation_time=str(reservation_dict["reservation_time"]),
-                number_of_people=reservation_dict["number_of_people"],
-                special_requests=reservation_dict.get("special_requests"),
-                menu_items=reservation_dict.get("menu_items")
+            SELECT inserted.*
+            FROM inserted
+            JOIN input USING (id)
+            ORDER BY input.ord
+            """,
+            (
+                [data.reservation_date for data in reservations_data],
+                [data.reservation_time for data in reservations_data],
+                [data.number_of_people for data in reservations_data],
+                [data.special_requests for data in reservations_data],
+                [data.payment_intent_id for data in reservations_data],
+                [amount for _status, amount in payments],
+                [payment_status for payment_status, _amount in payments],
+                current_user["id"],
+            )
+        )
+        reservations = cursor.fetchall()
+        
+        # すべての予約のメニューアイテムを1回のINSERTで挿入
+        menu_rows = [
+            (reservation["id"], menu_item.menu_id, menu_item.quantity)
+            for reservation, data in zip(reservations, reservations_data)
+            for menu_item in (data.menu_items or [])
+        ]
+        if menu_rows:
+            execute_values(
+                cursor,
+                "INSERT INTO reservation_menu_items (reservation_id, menu_id, quantity) VALUES %s",
+                menu_rows
             )
-        except Exception as e:
-            # Slack通知のエラーはログに記録するが、予約処理自体は成功とする
-            print(f"Slack通知送信エラー: {str(e)}")
         
-        return reservation_dict
+        conn.commit()
+        _invalidate_reservations_cache(current_user["id"])
+        
+        # メニュー情報を1回のクエリでまとめて取得して追加
+        menu_items = _fetch_menu_items(cursor, [reservation["id"] for reservation in reservations]) if menu_rows else {}
+        for reservation, data in zip(reservations, reservations_data):
+            if data.menu_items:
+                reservation["menu_items"] = menu_items[reservation["id"]]
+            _notify_confirmed(background_tasks, reservation, current_user)
+        
+        return reservations
     except HTTPException:
         conn.rollback()
         raise
@@ -728,84 +1161,106 @@ async def create_reservation(
             detail=f"予約の作成に失敗しました: {str(e)}"
         )
     finally:
+        # 接続の返却は依存関数(get_db)が行う
         cursor.close()
-        conn.close()
 
 
-@app.get("/api/reservations")
-async def get_reservations(current_user: dict = Depends(get_current_user)):
+@app.get("/api/reservations", response_model=List[ReservationOut])
+def get_reservations(
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
     """
     現在ログインしているユーザーの予約一覧を取得するエンドポイント
+    一覧は短時間キャッシュし、ETagがIf-None-Matchと一致する場合は304を返す
+    キャッシュにある場合はDB接続を借りない（ポーリングでプールの枠を使わないため）
     
     Args:
+        request: リクエスト情報（If-None-Matchヘッダーの確認に使用）
         current_user: 認証されたユーザー情報
     
+    Returns:
+        Response: 予約一覧のJSON（変更がない場合は304）
+    """
+    user_id = current_user["id"]
+    with _RESERVATIONS_CACHE_LOCK:
+        cached = _RESERVATIONS_CACHE.get(user_id)
+        generation = _RESERVATIONS_GENERATION.get(user_id, 0)
+    if cached is None:
+        conn = get_db_connection()
+        try:
+            reservations = _fetch_reservations(conn, user_id)
+        finally:
+            release_db_connection(conn)
+        # 日付・時間の変換や不要な列の除外はresponse_modelと同じ型付きシリアライザで行う
+        body = _RESERVATION_LIST_ADAPTER.dump_json(_RESERVATION_LIST_ADAPTER.validate_python(reservations))
+        cached = (_make_etag(body), body)
+        with _RESERVATIONS_CACHE_LOCK:
+            # 取得中に予約が作成・キャンセルされた場合は、古い一覧をキャッシュに入れない
+            if _RESERVATIONS_GENERATION.get(user_id, 0) == generation:
+                _RESERVATIONS_CACHE[user_id] = cached
+    
+    etag, body = cached
+    return _etag_response(request, body, etag)
+
+
+def _fetch_reservations(conn, user_id: int) -> list:
+    """
+    ユーザーの予約一覧をメニュー情報付きでDBから取得する関数
+    
+    Args:
+        conn: データベース接続
+        user_id: ユーザーID
+    
     Returns:
         list: 予約一覧
+    
+    Raises:
+        HTTPException: 取得に失敗した場合
     """
-    conn = get_db_connection()
     cursor = get_db_cursor(conn)
     
     try:
         # ユーザーの予約を取得
-        cursor.execute(
+        # 並び順はidx_reservations_user_dateインデックスの順序と一致するので、ソートは発生しない
+        execute_prepared(
+            cursor,
+            "get_reservations",
             """
             SELECT id, user_id, reservation_date, reservation_time, number_of_people, special_requests, status, payment_intent_id, amount, payment_status, created_at
             FROM reservations
-            WHERE user_id = %s
+            WHERE user_id = $1
             ORDER BY reservation_date DESC, reservation_time DESC
             """,
-            (current_user["id"],)
+            (user_id,)
         )
         
         reservations = cursor.fetchall()
         
-        # 時間を文字列に変換し、メニュー情報を追加
-        result = []
-        for reservation in reservations:
-            reservation_dict = dict(reservation)
-            if reservation_dict["reservation_time"]:
-                reservation_dict["reservation_time"] = str(reservation_dict["reservation_time"])
-            
-            # メニュー情報を取得
-            cursor.execute(
-                """
-                SELECT m.id, m.name, m.price, rmi.quantity
-                FROM menus m
-                INNER JOIN reservation_menu_items rmi ON m.id = rmi.menu_id
-                WHERE rmi.reservation_id = %s
-                """,
-                (reservation_dict["id"],)
-            )
-            menu_items = cursor.fetchall()
-            # 一覧取得時も menu_id キーを含む形式に統一する
-            reservation_dict["menu_items"] = [
-                {
-                    "menu_id": item["id"],
-                    "name": item["name"],
-                    "price": item["price"],
-                    "quantity": item["quantity"],
-                }
-                for item in menu_items
-            ]
-            
-            result.append(reservation_dict)
-        
-        return result
+        # すべての予約のメニュー情報を1回のクエリでまとめて取得して追加
+        # 日付・時間はシリアライザが文字列にするので、ここでは変換しない
+        if reservations:
+            menu_items = _fetch_menu_items(cursor, [reservation["id"] for reservation in reservations])
+            for reservation in reservations:
+                reservation["menu_items"] = menu_items[reservation["id"]]
+        
+        return reservations
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"予約の取得に失敗しました: {str(e)}"
         )
     finally:
+        # 接続の返却は依存関数(get_db)が行う
         cursor.close()
-        conn.close()
 
 
 @app.delete("/api/reservations/{reservation_id}")
-async def cancel_reservation(
+def cancel_reservation(
     reservation_id: int,
-    current_user: dict = Depends(get_current_user)
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+    conn = Depends(get_db)
 ):
     """
     予約をキャンセルするエンドポイント
@@ -814,93 +1269,74 @@ async def cancel_reservation(
     
     Args:
         reservation_id: 予約ID
+        background_tasks: レスポンス送信後に実行する処理（Slack通知）
         current_user: 認証されたユーザー情報
+        conn: データベース接続（依存関数get_dbから取得）
     
     Returns:
         dict: キャンセルされた予約情報
     """
-    conn = get_db_connection()
     cursor = get_db_cursor(conn)
     
     try:
-        # 予約が存在し、ユーザーが所有しているか確認
-        cursor.execute(
+        # 予約を削除（CASCADEにより関連するメニューアイテムも自動削除）
+        # WHEREで所有者も確認するため、存在確認と削除を1回の往復でまとめて行う
+        execute_prepared(
+            cursor,
+            "cancel_reservation",
             """
-            SELECT id, payment_intent_id, payment_status, reservation_date, reservation_time, number_of_people
-            FROM reservations
-            WHERE id = %s AND user_id = %s
+            DELETE FROM reservations
+            WHERE id = $1 AND user_id = $2
+            RETURNING id, payment_intent_id, payment_status, reservation_date, reservation_time, number_of_people
             """,
             (reservation_id, current_user["id"])
         )
         reservation = cursor.fetchone()
         
         if not reservation:
+            # 存在しない、または他のユーザーの予約の場合
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="予約が見つかりません"
             )
+        # 外部API（Stripe）の呼び出し中に行ロックを保持しないよう、返金の前に確定する
+        conn.commit()
+        _invalidate_reservations_cache(current_user["id"])
         
-        # 予約情報を取得（通知用）
-        reservation_dict = dict(reservation)
-        reservation_date = str(reservation_dict["reservation_date"])
-        reservation_time = str(reservation_dict["reservation_time"]) if reservation_dict["reservation_time"] else ""
-        number_of_people = reservation_dict["number_of_people"]
-        payment_intent_id = reservation_dict.get("payment_intent_id")
-        payment_status = reservation_dict.get("payment_status")
+        # 削除した予約の情報（返金・通知用）
+        reservation_date = str(reservation["reservation_date"])
+        reservation_time = str(reservation["reservation_time"]) if reservation["reservation_time"] else ""
+        number_of_people = reservation["number_of_people"]
+        payment_intent_id = reservation["payment_intent_id"]
+        payment_status = reservation["payment_status"]
         
         # 決済が完了している場合は返金処理を実行
         refund_info = None
         if payment_intent_id and payment_status == 'succeeded':
             try:
                 if stripe.api_key:
-                    # Payment Intentを取得
-                    payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
-                    
-                    if payment_intent.status == 'succeeded':
-                        # Charge IDを取得
-                        charge_id = payment_intent.latest_charge
-                        if isinstance(charge_id, str):
-                            # 返金処理を実行
-                            refund = stripe.Refund.create(charge=charge_id)
-                            refund_info = {
-                                'refund_id': refund.id,
-                                'amount': refund.amount,
-                                'status': refund.status
-                            }
-                            
-                            # 決済ステータスを更新
-                            cursor.execute(
-                                """
-                                UPDATE reservations
-                                SET payment_status = 'refunded'
-                                WHERE id = %s
-                                """,
-                                (reservation_id,)
-                            )
-            except Exception as e:
+                    # 返金処理を実行（Payment Intentの取得はせず、1回のAPI呼び出しで返金する）
+                    refund = _refund_payment_intent(payment_intent_id)
+                    refund_info = {
+                        'refund_id': refund.id,
+                        'amount': refund.amount,
+                        'status': refund.status
+                    }
+            except Exception:
                 # 返金処理のエラーはログに記録するが、キャンセル処理は続行
-                print(f"返金処理エラー: {str(e)}")
+                logger.warning("返金処理エラー: reservation_id=%s", reservation_id, exc_info=True)
         
-        # 予約を削除（CASCADEにより関連するメニューアイテムも自動削除）
-        cursor.execute(
-            "DELETE FROM reservations WHERE id = %s AND user_id = %s",
-            (reservation_id, current_user["id"])
+        # Slackに予約キャンセル通知を送信（レスポンス送信後に通知をキューに積み、送信は通知用のスレッドで行う）
+        # 通知のエラーは通知側でログに記録され、キャンセル処理自体は成功とする
+        background_tasks.add_task(
+            notify_reservation_cancelled,
+            reservation_id=reservation_id,
+            user_name=current_user["name"],
+            user_email=current_user["email"],
+            reservation_date=reservation_date,
+            reservation_time=reservation_time,
+            number_of_people=number_of_people
         )
-        conn.commit()
-        
-        # Slackに予約キャンセル通知を送信（非同期で実行、エラーが発生してもキャンセル処理は続行）
-        try:
-            notify_reservation_cancelled(
-                reservation_id=reservation_id,
-                user_name=current_user["name"],
-                user_email=current_user["email"],
-                reservation_date=reservation_date,
-                reservation_time=reservation_time,
-                number_of_people=number_of_people
-            )
-        except Exception as e:
-            # Slack通知のエラーはログに記録するが、キャンセル処理自体は成功とする
-            print(f"Slack通知送信エラー: {str(e)}")
         
         response = {"message": "予約がキャンセルされました", "reservation_id": reservation_id}
         if refund_info:
@@ -916,5 +1352,5 @@ async def cancel_reservation(
             detail=f"予約のキャンセルに失敗しました: {str(e)}"
         )
     finally:
+        # 接続の返却は依存関数(get_db)が行う
         cursor.close()
-        conn.close()
@@ -0,0 +1,45 @@
+# アプリケーション全体の設定を読み込むモジュール
+# .envファイルの読み込みはこのモジュールで1回だけ行い、各モジュールはここから設定値を取得する
+
+import os  # 環境変数の取得に使用
+from dotenv import load_dotenv  # .envファイルから環境変数を読み込む
+
+# .envファイルから環境変数を読み込む
+# モジュールが再読み込みされても（pytestの収集やリロードツールなど）ファイルを読み直さない
+if not os.getenv("_ENV_LOADED"):
+    load_dotenv()
+    os.environ["_ENV_LOADED"] = "1"
+
+# データベース接続情報を環境変数から取得
+# 環境変数が設定されていない場合はデフォルト値を使用
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),  # データベースホスト（デフォルト: localhost）
+    "port": int(os.getenv("DB_PORT", "5432")),  # データベースポート（デフォルト: 5432）
+    "database": os.getenv("DB_NAME", "ramen_restaurant"),  # データベース名（デフォルト: ramen_restaurant）
+    "user": os.getenv("DB_USER", "postgres"),  # データベースユーザー名（デフォルト: postgres）
+    "password": os.getenv("DB_PASSWORD", "postgres"),  # データベースパスワード（デフォルト: postgres）
+}
+
+# コネクションプールの設定
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "4"))  # 常に保持しておく接続数
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "32"))  # 同時に貸し出せる接続数の上限
+
+# CORSで許可するオリジン（カンマ区切り、デフォルト: すべて許可）
+# nginx経由の同一オリジン構成では空にするとCORSミドルウェア自体を登録しない
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "*").split(",") if origin.strip()]
+
+# 同期(def)のエンドポイントを実行するスレッドプールの上限
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "100"))
+
+# パスワードハッシュ化（argon2id）の設定
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))  # 反復回数
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", str(64 * 1024)))  # 使用メモリ（KiB、デフォルト: 64MiB）
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "2"))  # 並列度
+# 起動時にハッシュ化を1回実行しておくかどうか（最初のログインで初期化コストを払わないため）
+PWD_WARMUP = os.getenv("PWD_WARMUP", "1") == "1"
+
+# ログ出力のレベル（DEBUG, INFO, WARNINGなど）
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# JWT設定（開発環境用のデフォルト値を設定）
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")  # JWT署名用の秘密鍵
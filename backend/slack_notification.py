@@ -1,51 +1,424 @@
 # Slack通知機能を実装するモジュール
 # Slack Webhookを使用して予約の決定・キャンセルを通知
+# 通知はキューに積むだけで呼び出し元に戻り、実際の送信は専用のスレッドで1件ずつ行う
 
+import orjson  # pyright: ignore[reportMissingImports]
 import requests  # pyright: ignore[reportMissingImports, reportMissingModuleSource]
+from datetime import datetime  # pyright: ignore[reportMissingImports]
+from functools import lru_cache  # pyright: ignore[reportMissingImports]
+from requests.adapters import HTTPAdapter  # pyright: ignore[reportMissingImports, reportMissingModuleSource]
 from typing import Dict, Optional  # pyright: ignore[reportMissingImports]
 import os  # pyright: ignore[reportMissingImports]
-from dotenv import load_dotenv  # pyright: ignore[reportMissingImports]
+import atexit  # pyright: ignore[reportMissingImports]
+import logging  # pyright: ignore[reportMissingImports]
+import queue  # pyright: ignore[reportMissingImports]
+import random  # pyright: ignore[reportMissingImports]
+import threading  # pyright: ignore[reportMissingImports]
+import time  # pyright: ignore[reportMissingImports]
+# .envファイルはsettingsモジュールの読み込み時に1回だけ読み込まれる
+import settings  # pyright: ignore[reportMissingImports]
 
-# .envファイルから環境変数を読み込む
-load_dotenv()
-
-# Slack Webhook URL（環境変数から取得）
+# Slack Webhook URL（環境変数から取得、未設定の場合は通知を送らない）
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL")
 
+logger = logging.getLogger(__name__)
+
+# Slack Webhookへの接続を使い回すセッション
+# 通知ごとにTCP・TLS接続を張り直さないよう、keep-aliveの接続をプールしておく
+# 送信は通知用のスレッド1つからしか行わないため、接続は1本あれば足りる
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+# 送信するJSONはorjsonで変換し、Content-Typeは自分で指定する
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# 送信に失敗した場合の再試行の設定
+# 429（レート制限）はRetry-Afterヘッダーの秒数だけ待ち、5xxや接続エラーは指数バックオフ（+ジッター）で待つ
+_MAX_ATTEMPTS = 8  # 最初の送信を含めた最大試行回数
+_BACKOFF_BASE = 0.5  # 指数バックオフの基準秒数（0.5, 1, 2, 4, ...秒）
+_BACKOFF_MAX = 30.0  # 1回あたりの待ち時間の上限（秒）
+_BACKOFF_JITTER = 0.5  # 待ち時間に加える乱数の最大秒数（再試行のタイミングを分散させる）
+
+# Slack Webhookへの送信レートの上限（Slackの目安は1つのWebhookにつき1秒1件）
+_RATE_PER_SECOND = 1.0
+_RATE_BURST = 3  # 続けて送信できる件数
+# Slackが混雑している場合の送信レートの調整（AIMD: 成功で少しずつ上げ、429・5xxで半分に下げる）
+_RATE_MIN = 0.05  # 下げる場合の下限（20秒に1件）
+_RATE_INCREASE = 0.1  # 成功1回ごとに上げる量（_RATE_PER_SECONDまで）
+
+
+class _TokenBucket:
+    """
+    トークンバケット方式の流量制限
+    
+    トークンは1秒あたりrate個ずつ、capacity個まで貯まる。送信のたびに1個使い、
+    足りない場合は貯まるまで待つ。429を受けてから待つのではなく、事前に送信の間隔を空ける
+    
+    補充の速さは送信結果に応じて調整する（AIMD）。429・5xxの場合は半分に下げ、
+    成功するたびに少しずつ元の速さ（max_rate）まで戻す
+    """
+    
+    def __init__(self, rate: float, capacity: int, min_rate: float = _RATE_MIN, increase: float = _RATE_INCREASE):
+        """
+        Args:
+            rate: 1秒あたりに補充するトークンの数（上げる場合の上限も兼ねる）
+            capacity: 貯めておけるトークンの上限
+            min_rate: 下げる場合の下限
+            increase: 成功1回ごとに上げる量
+        """
+        self._rate = rate
+        self._max_rate = rate
+        self._min_rate = min_rate
+        self._increase = increase
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    @property
+    def rate(self) -> float:
+        """現在の1秒あたりの補充数"""
+        return self._rate
+    
+    def _refill(self) -> None:
+        """前回からの経過時間分のトークンを補充する（ロックを取得した状態で呼ぶ）"""
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+    
+    def on_success(self) -> None:
+        """送信に成功した場合に、補充の速さを少し上げる"""
+        with self._lock:
+            if self._rate < self._max_rate:
+                self._refill()
+                self._rate = min(self._max_rate, self._rate + self._increase)
+    
+    def on_throttled(self) -> None:
+        """429・5xxが返った場合に、補充の速さを半分に下げる"""
+        with self._lock:
+            self._refill()
+            self._rate = max(self._min_rate, self._rate / 2)
+    
+    def acquire(self) -> None:
+        """トークンを1個使う（足りない場合は補充されるまで待つ）"""
+        with self._lock:
+            self._refill()
+            # 足りない分は先に差し引いておき、次に呼ばれた時はその分だけ長く待たせる
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+_rate_limiter = _TokenBucket(rate=_RATE_PER_SECOND, capacity=_RATE_BURST)
+
+# 送信待ちの通知（(メッセージ, blocks)のタプル、_WARM_UP、終了の合図のNone）
+_NOTIFICATION_QUEUE: "queue.Queue[Optional[object]]" = queue.Queue()
+# 接続を事前に確立しておく合図
+_WARM_UP = object()
+_WARM_UP_TIMEOUT = 2  # 事前接続の待ち時間の上限（秒）
+# 終了時に送信待ちの通知を送り切るまで待つ最大秒数
+_SHUTDOWN_TIMEOUT = 10
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+# 送信待ちの通知がたまっている場合に、1件のメッセージへまとめる最大件数
+# 1通知あたり最大4ブロック + 区切り線で、Slackの上限（1メッセージ50ブロック）に収まる件数にする
+_MAX_BATCH = 10
+_DIVIDER_BLOCK = {"type": "divider"}
+
+
+def _send_batch(items: list) -> bool:
+    """
+    複数の通知を区切り線でつないだ1件のメッセージとして送信する関数
+    
+    Args:
+        items: (メッセージ, blocks)のタプルのリスト
+    
+    Returns:
+        bool: 送信成功時True、失敗時False
+    """
+    if len(items) == 1:
+        return send_slack_notification(*items[0])
+    
+    blocks = []
+    for message, item_blocks in items:
+        if blocks:
+            blocks.append(_DIVIDER_BLOCK)
+        # blocksのない通知は、フォールバック用のテキストをそのままブロックにする
+        blocks.extend(item_blocks or [{"type": "section", "text": {"type": "mrkdwn", "text": message}}])
+    return send_slack_notification("\n".join(message for message, _ in items), blocks)
+
+
+def _notification_worker() -> None:
+    """
+    キューから通知を取り出して送信し続ける関数（専用のスレッドで実行する）
+    
+    流量制限や再試行で待っている間に通知がたまった場合は、最大_MAX_BATCH件を1件のメッセージにまとめて送る。
+    通知が1件ずつ届く通常時は、まとめるために待つことはしない。
+    """
+    while True:
+        batch = [_NOTIFICATION_QUEUE.get()]
+        while len(batch) < _MAX_BATCH:
+            try:
+                batch.append(_NOTIFICATION_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+        
+        items = [item for item in batch if isinstance(item, tuple)]
+        try:
+            if _WARM_UP in batch and not items:
+                _warm_up_connection()
+            if items:
+                _send_batch(items)
+        except Exception:
+            logger.warning("Slack通知送信エラー", exc_info=True)
+        finally:
+            for _ in batch:
+                _NOTIFICATION_QUEUE.task_done()
+        
+        if None in batch:
+            # 終了の合図を受け取った
+            return
+
+
+def _warm_up_connection() -> None:
+    """
+    Slack Webhookへの接続（DNS解決・TCP・TLS）を事前に確立しておく関数
+    
+    HEADリクエストは通知として扱われず（405などが返る）、接続だけがセッションのプールに残る。
+    """
+    try:
+        _SESSION.head(SLACK_WEBHOOK_URL, timeout=_WARM_UP_TIMEOUT)
+    except requests.RequestException:
+        # 事前接続に失敗しても、最初の通知の送信時に接続し直すだけなので無視する
+        logger.info("Slack Webhookへの事前接続に失敗しました", exc_info=True)
+
+
+def _stop_worker() -> None:
+    """プロセス終了時に、送信待ちの通知を送り切ってからスレッドを止める関数"""
+    if _worker is not None:
+        _NOTIFICATION_QUEUE.put(None)
+        _worker.join(_SHUTDOWN_TIMEOUT)
+
+
+def enqueue_slack_notification(message: str, blocks: Optional[list] = None) -> None:
+    """
+    Slackへの通知を送信待ちのキューに積む関数
+    
+    送信は専用のスレッドで行うため、Slackの応答を待たずにすぐ戻る。
+    スレッドは最初の通知で起動する（通知を送らないプロセスではスレッドを作らない）。
+    
+    Args:
+        message: 通知メッセージ（フォールバック用）
+        blocks: Slack Block Kit形式のメッセージブロック（オプション）
+    """
+    _start_worker()
+    _NOTIFICATION_QUEUE.put((message, blocks))
+
+
+def warm_up_slack_connection() -> None:
+    """
+    アプリ起動時にSlack Webhookへの接続を通知用のスレッドで確立しておく関数
+    
+    起動後の最初の通知が、DNS解決やTLSハンドシェイクの分だけ遅れないようにする。
+    Webhookが設定されていない場合は何もしない。
+    """
+    if not SLACK_WEBHOOK_URL:
+        return
+    _start_worker()
+    _NOTIFICATION_QUEUE.put(_WARM_UP)
+
+
+def _start_worker() -> None:
+    """通知用のスレッドがまだなければ起動する関数"""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = threading.Thread(target=_notification_worker, name="slack-notification", daemon=True)
+                _worker.start()
+                atexit.register(_stop_worker)
+
+
+def wait_for_notifications() -> None:
+    """キューに積まれた通知がすべて送信（または失敗）されるまで待つ関数"""
+    _NOTIFICATION_QUEUE.join()
+
+
+def _retry_after_seconds(response) -> float:
+    """
+    429応答のRetry-Afterヘッダーから待ち時間（秒）を取得する関数
+    
+    Args:
+        response: Slack Webhookの応答
+    
+    Returns:
+        float: 待ち時間（ヘッダーがない・不正な場合は1秒）
+    """
+    try:
+        return min(float(response.headers.get("Retry-After", "1")), _BACKOFF_MAX)
+    except ValueError:
+        return 1.0
+
+
+def _backoff_seconds(attempt: int) -> float:
+    """
+    指数バックオフの待ち時間（秒）を計算する関数
+    
+    Args:
+        attempt: 失敗した試行の番号（0始まり）
+    
+    Returns:
+        float: 待ち時間
+    """
+    return min(_BACKOFF_BASE * 2 ** attempt, _BACKOFF_MAX) + random.uniform(0, _BACKOFF_JITTER)
+
+
 def send_slack_notification(message: str, blocks: Optional[list] = None) -> bool:
     """
     Slackに通知を送信する関数
     
+    レート制限（429）、サーバーエラー（5xx）、接続エラーの場合は待ってから再試行する。
+    応答待ちのタイムアウトは投稿済みの可能性があるため、重複を避けて再試行しない。
+    通知用のスレッドから呼ばれるため、待っている間もリクエストの処理は止まらない。
+    
     Args:
         message: 通知メッセージ（フォールバック用）
         blocks: Slack Block Kit形式のメッセージブロック（オプション）
     
     Returns:
-        bool: 送信成功時True、失敗時False
+        bool: 送信成功時True、失敗時（再試行をすべて使い切った場合を含む）・Webhook未設定時False
     """
-    try:
-        payload = {
-            "text": message,  # フォールバック用のテキスト
-        }
-        
-        # blocksが指定されている場合は追加
-        if blocks:
-            payload["blocks"] = blocks
-        
-        # Slack WebhookにPOSTリクエストを送信
-        response = requests.post(SLACK_WEBHOOK_URL, json=payload, timeout=10)
+    if not SLACK_WEBHOOK_URL:
+        return False
+    
+    payload = {
+        "text": message,  # フォールバック用のテキスト
+    }
+    
+    # blocksが指定されている場合は追加
+    if blocks:
+        payload["blocks"] = blocks
+    # 再試行しても同じ内容を送るので、JSONへの変換は1回だけ行う
+    body = orjson.dumps(payload)
+    
+    for attempt in range(_MAX_ATTEMPTS):
+        is_last = attempt == _MAX_ATTEMPTS - 1
+        # 送信レートの上限を超えないよう、必要なら送信前に待つ
+        _rate_limiter.acquire()
+        try:
+            # Slack WebhookにPOSTリクエストを送信
+            response = _SESSION.post(SLACK_WEBHOOK_URL, data=body, headers=_JSON_HEADERS, timeout=10)
+        except requests.ReadTimeout:
+            # 送信後に応答を待つ間のタイムアウトは、Slackが既に投稿している可能性がある
+            # Webhookへの投稿は冪等ではない（再送すると同じ通知が重複する）ため、再試行しない
+            logger.warning("Slack通知送信エラー（応答待ちでタイムアウト）", exc_info=True)
+            return False
+        except requests.ConnectionError:
+            # 一時的な接続エラー（接続時のタイムアウトConnectTimeoutを含む）は、送信前なので再試行する
+            if is_last:
+                logger.warning("Slack通知送信エラー", exc_info=True)
+                return False
+            time.sleep(_backoff_seconds(attempt))
+            continue
+        except Exception:
+            logger.warning("Slack通知送信エラー", exc_info=True)
+            return False
         
         # ステータスコードが200の場合は成功
         if response.status_code == 200:
+            _rate_limiter.on_success()
             return True
-        else:
-            print(f"Slack通知エラー: ステータスコード {response.status_code}, レスポンス: {response.text}")
-            return False
-    except Exception as e:
-        print(f"Slack通知送信エラー: {str(e)}")
+        if response.status_code == 429 or response.status_code >= 500:
+            # Slackが混雑しているので、以降の送信の間隔を広げる
+            _rate_limiter.on_throttled()
+        if response.status_code == 429 and not is_last:
+            # レート制限の場合は、Slackが指定した秒数だけ待つ
+            time.sleep(_retry_after_seconds(response))
+            continue
+        if response.status_code >= 500 and not is_last:
+            time.sleep(_backoff_seconds(attempt))
+            continue
+        
+        logger.warning("Slack通知エラー: ステータスコード %s, レスポンス: %s", response.status_code, response.text)
         return False
+    return False
+
+
+# 通知の見出しブロック（内容が変わらないので、通知のたびに作らず使い回す）
+_CONFIRMED_HEADER_BLOCK = {
+    "type": "header",
+    "text": {
+        "type": "plain_text",
+        "text": "✅ 新しい予約が確定しました",
+        "emoji": True
+    }
+}
+_CANCELLED_HEADER_BLOCK = {
+    "type": "header",
+    "text": {
+        "type": "plain_text",
+        "text": "❌ 予約がキャンセルされました",
+        "emoji": True
+    }
+}
+
+
+def _reservation_fields_block(
+    reservation_id: int,
+    user_name: str,
+    user_email: str,
+    formatted_date: str,
+    formatted_time: str,
+    number_of_people: int,
+) -> dict:
+    """
+    予約の内容（予約ID・日時・お客様名・人数・メールアドレス）を並べたブロックを作る関数
+    
+    Args:
+        reservation_id: 予約ID
+        user_name: ユーザー名
+        user_email: ユーザーのメールアドレス
+        formatted_date: フォーマット済みの予約日
+        formatted_time: フォーマット済みの予約時間
+        number_of_people: 人数
+    
+    Returns:
+        dict: Slack Block Kit形式のsectionブロック
+    """
+    fields = (
+        ("予約ID", f"#{reservation_id}"),
+        ("予約日時", f"{formatted_date} {formatted_time}"),
+        ("お客様名", user_name),
+        ("人数", f"{number_of_people}名"),
+        ("メールアドレス", user_email),
+    )
+    return {
+        "type": "section",
+        "fields": [{"type": "mrkdwn", "text": f"*{label}:*\n{value}"} for label, value in fields],
+    }
+
+
+def _format_menu_line(item: dict) -> str:
+    """
+    注文メニュー1件を通知用の1行にフォーマットする関数
+    
+    Args:
+        item: メニュー情報（例: {"name": str, "quantity": int, "price": int}）
+    
+    Returns:
+        str: フォーマットされた行（例: - 醤油ラーメン × 2個 (¥1,800)）
+    """
+    name = item.get("name", "不明なメニュー")
+    quantity = item.get("quantity", 1)
+    price = item.get("price")
+    if price is None:
+        return f"- {name} × {quantity}個"
+    return f"- {name} × {quantity}個 (¥{price * quantity:,})"
 
 
+# 予約日・予約時間の種類は限られるので、フォーマット結果をキャッシュして解析を繰り返さない
+@lru_cache(maxsize=1024)
 def format_reservation_date(date_str: str) -> str:
     """
     予約日を日本語形式にフォーマットする関数
@@ -57,13 +430,13 @@ def format_reservation_date(date_str: str) -> str:
         str: フォーマットされた日付文字列（例: 2024年1月15日）
     """
     try:
-        from datetime import datetime
         date_obj = datetime.strptime(date_str, "%Y-%m-%d")
         return date_obj.strftime("%Y年%m月%d日")
-    except:
+    except ValueError:
         return date_str
 
 
+@lru_cache(maxsize=1024)
 def format_reservation_time(time_str: str) -> str:
     """
     予約時間を日本語形式にフォーマットする関数
@@ -81,7 +454,7 @@ def format_reservation_time(time_str: str) -> str:
         
         hour, minute = time_str.split(":")
         return f"{int(hour)}時{int(minute)}分"
-    except:
+    except (ValueError, AttributeError):
         return time_str
 
 
@@ -94,7 +467,7 @@ def notify_reservation_confirmed(
     number_of_people: int,
     special_requests: Optional[str] = None,
     menu_items: Optional[list] = None,
-) -> bool:
+) -> None:
     """
     予約決定（作成）をSlackに通知する関数
     
@@ -108,9 +481,12 @@ def notify_reservation_confirmed(
         special_requests: 特別な要望（オプション）
         menu_items: 予約したメニュー一覧（例: [{\"name\": str, \"quantity\": int, \"price\": int}]）
     
-    Returns:
-        bool: 送信成功時True、失敗時False
+    送信は専用のスレッドで行い、この関数は通知をキューに積んだらすぐに戻る。
     """
+    # Webhookが設定されていない環境では、メッセージを組み立てずに何もしない
+    if not SLACK_WEBHOOK_URL:
+        return
+    
     # 日付と時間をフォーマット
     formatted_date = format_reservation_date(reservation_date)
     formatted_time = format_reservation_time(reservation_time)
@@ -118,59 +494,17 @@ def notify_reservation_confirmed(
     # Slack Block Kit形式のメッセージを作成。各ブロックは type とその他のフィールドを記載する.
     # インタラクティブ性を対応させる予定。
     blocks = [
-        {
-            "type": "header",
-            "text": {
-                "type": "plain_text",
-                "text": "✅ 新しい予約が確定しました",
-                "emoji": True
-            }
-        },
-        {
-            "type": "section",
-            "fields": [
-                {
-                    "type": "mrkdwn",
-                    "text": f"*予約ID:*\n#{reservation_id}"
-                },
-                {
-                    "type": "mrkdwn",
-                    "text": f"*予約日時:*\n{formatted_date} {formatted_time}"
-                },
-                {
-                    "type": "mrkdwn",
-                    "text": f"*お客様名:*\n{user_name}"
-                },
-                {
-                    "type": "mrkdwn",
-                    "text": f"*人数:*\n{number_of_people}名"
-                },
-                {
-                    "type": "mrkdwn",
-                    "text": f"*メールアドレス:*\n{user_email}"
-                }
-            ]
-        }
+        _CONFIRMED_HEADER_BLOCK,
+        _reservation_fields_block(reservation_id, user_name, user_email, formatted_date, formatted_time, number_of_people),
     ]
     
     # メニュー情報がある場合は追加
     if menu_items:
-        lines = []
-        for item in menu_items:
-            name = item.get("name", "不明なメニュー")
-            quantity = item.get("quantity", 1)
-            price = item.get("price")
-            if price is not None:
-                subtotal = price * quantity
-                lines.append(f"- {name} × {quantity}個 (¥{subtotal:,})")
-            else:
-                lines.append(f"- {name} × {quantity}個")
-
         blocks.append({
             "type": "section",
             "text": {
                 "type": "mrkdwn",
-                "text": "*注文メニュー:*\n" + "\n".join(lines)
+                "text": "*注文メニュー:*\n" + "\n".join(_format_menu_line(item) for item in menu_items)
             }
         })
     
@@ -185,8 +519,9 @@ def notify_reservation_confirmed(
         })
     
     # 通知を送信
-    message = f"新しい予約が確定しました - 予約ID: #{reservation_id}, お客様: {user_name}, 日時: {formatted_date} {formatted_time}, 人数: {number_of_people}名"
-    return send_slack_notification(message, blocks)
+    # 詳細はblocksで表示されるため、フォールバック用のテキスト（モバイルのプッシュ通知などに使われる）は短い要約にする
+    message = f"新しい予約が確定しました - 予約ID: #{reservation_id}"
+    enqueue_slack_notification(message, blocks)
 
 
 def notify_reservation_cancelled(
@@ -196,7 +531,7 @@ def notify_reservation_cancelled(
     reservation_date: str,
     reservation_time: str,
     number_of_people: int
-) -> bool:
+) -> None:
     """
     予約キャンセルをSlackに通知する関数
     
@@ -208,51 +543,24 @@ def notify_reservation_cancelled(
         reservation_time: 予約時間（HH:MM:SS形式）
         number_of_people: 人数
     
-    Returns:
-        bool: 送信成功時True、失敗時False
+    送信は専用のスレッドで行い、この関数は通知をキューに積んだらすぐに戻る。
     """
+    # Webhookが設定されていない環境では、メッセージを組み立てずに何もしない
+    if not SLACK_WEBHOOK_URL:
+        return
+    
     # 日付と時間をフォーマット
     formatted_date = format_reservation_date(reservation_date)
     formatted_time = format_reservation_time(reservation_time)
     
     # Slack Block Kit形式のメッセージを作成
     blocks = [
-        {
-            "type": "header",
-            "text": {
-                "type": "plain_text",
-                "text": "❌ 予約がキャンセルされました",
-                "emoji": True
-            }
-        },
-        {
-            "type": "section",
-            "fields": [
-                {
-                    "type": "mrkdwn",
-                    "text": f"*予約ID:*\n#{reservation_id}"
-                },
-                {
-                    "type": "mrkdwn",
-                    "text": f"*予約日時:*\n{formatted_date} {formatted_time}"
-                },
-                {
-                    "type": "mrkdwn",
-                    "text": f"*お客様名:*\n{user_name}"
-                },
-                {
-                    "type": "mrkdwn",
-                    "text": f"*人数:*\n{number_of_people}名"
-                },
-                {
-                    "type": "mrkdwn",
-                    "text": f"*メールアドレス:*\n{user_email}"
-                }
-            ]
-        }
+        _CANCELLED_HEADER_BLOCK,
+        _reservation_fields_block(reservation_id, user_name, user_email, formatted_date, formatted_time, number_of_people),
     ]
     
     # 通知を送信
-    message = f"予約がキャンセルされました - 予約ID: #{reservation_id}, お客様: {user_name}, 日時: {formatted_date} {formatted_time}, 人数: {number_of_people}名"
-    return send_slack_notification(message, blocks)
+    # 詳細はblocksで表示されるため、フォールバック用のテキストは短い要約にする
+    message = f"予約がキャンセルされました - 予約ID: #{reservation_id}"
+    enqueue_slack_notification(message, blocks)
 
@@ -8,7 +8,7 @@ from fastapi import status
 class TestAuthRegister:
     """ユーザー登録のテスト"""
     
-    def test_register_success(self, client, test_db):
+    def test_register_success(self, client, db_tx):
         """正常な登録"""
         user_data = {
             "email": "newuser@example.com",
@@ -41,7 +41,7 @@ class TestAuthRegister:
         data = response.json()
         assert "既に登録されています" in data["detail"]
     
-    def test_register_invalid_email(self, client, test_db):
+    def test_register_invalid_email(self, client, db_tx):
         """無効なメールアドレス"""
         user_data = {
             "email": "invalid-email",
@@ -51,6 +51,30 @@ class TestAuthRegister:
         
         response = client.post("/api/auth/register", json=user_data)
         assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    
+    def test_register_email_domain_normalized(self, client, db_tx):
+        """メールアドレスのドメイン部分は小文字にそろえて登録される"""
+        user_data = {
+            "email": "NewUser@Example.COM",
+            "password": "password123",
+            "name": "新規ユーザー"
+        }
+        
+        response = client.post("/api/auth/register", json=user_data)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["user"]["email"] == "NewUser@example.com"
+    
+    def test_register_unknown_field(self, client, db_tx):
+        """定義されていないキーを含む登録"""
+        user_data = {
+            "email": "newuser@example.com",
+            "password": "password123",
+            "name": "新規ユーザー",
+            "is_admin": True
+        }
+        
+        response = client.post("/api/auth/register", json=user_data)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
 
 class TestAuthLogin:
@@ -85,7 +109,7 @@ class TestAuthLogin:
         data = response.json()
         assert "正しくありません" in data["detail"]
     
-    def test_login_nonexistent_user(self, client, test_db):
+    def test_login_nonexistent_user(self, client, db_tx):
         """存在しないユーザー"""
         login_data = {
             "email": "nonexistent@example.com",
@@ -101,7 +125,7 @@ class TestAuthMe:
     
     def test_get_current_user_success(self, client, test_user):
         """正常なユーザー情報取得"""
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
+        headers = test_user["headers"]
         response = client.get("/api/auth/me", headers=headers)
         
         assert response.status_code == status.HTTP_200_OK
@@ -11,7 +11,9 @@ from auth import (
     verify_token,
     get_user_by_email,
     create_user,
-    authenticate_user
+    authenticate_user,
+    password_needs_rehash,
+    get_user_by_token
 )
 
 
@@ -36,6 +38,17 @@ class TestPasswordFunctions:
         
         assert verify_password(password, hashed) is True
         assert verify_password("wrongpassword", hashed) is False
+    
+    def test_verify_password_legacy_bcrypt(self):
+        """移行前のbcryptハッシュも照合でき、作り直しの対象になる"""
+        import bcrypt
+        password = "testpassword123"
+        legacy_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=4)).decode("utf-8")
+        
+        assert verify_password(password, legacy_hash) is True
+        assert verify_password("wrongpassword", legacy_hash) is False
+        assert password_needs_rehash(legacy_hash) is True
+        assert password_needs_rehash(get_password_hash(password)) is False
 
 
 class TestTokenFunctions:
@@ -58,89 +71,233 @@ class TestTokenFunctions:
         payload = verify_token(token)
         assert payload["sub"] == "test@example.com"
     
+    def test_create_access_token_expiry(self):
+        """有効期限（exp）がUNIX時間の整数秒で設定される"""
+        import time
+        from datetime import timedelta
+        
+        now = int(time.time())
+        payload = verify_token(create_access_token({"sub": "test@example.com"}))
+        assert isinstance(payload["exp"], int)
+        assert now + 30 * 60 <= payload["exp"] <= now + 30 * 60 + 5
+        
+        payload = verify_token(create_access_token({"sub": "test@example.com"}, timedelta(minutes=5)))
+        assert now + 5 * 60 <= payload["exp"] <= now + 5 * 60 + 5
+    
+    def test_verify_token_cached(self):
+        """同じトークンの2回目以降の検証はキャッシュから返される"""
+        import auth
+        
+        token = create_access_token({"sub": "test@example.com"})
+        with patch.object(auth._jwt, 'decode', wraps=auth._jwt.decode) as mock_decode:
+            assert verify_token(token)["sub"] == "test@example.com"
+            assert verify_token(token)["sub"] == "test@example.com"
+        
+        mock_decode.assert_called_once()
+    
+    def test_verify_token_expired_not_cached(self):
+        """トークンの有効期限が切れた後はキャッシュから返されない"""
+        import time
+        from datetime import timedelta
+        
+        token = create_access_token({"sub": "test@example.com"}, timedelta(seconds=1))
+        assert verify_token(token)["sub"] == "test@example.com"
+        
+        time.sleep(1.1)
+        with pytest.raises(HTTPException) as exc_info:
+            verify_token(token)
+        
+        assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+    
     def test_verify_token_invalid(self):
         """無効なトークンの検証"""
         with pytest.raises(HTTPException) as exc_info:
             verify_token("invalid_token_string")
         
         assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+    
+    def test_verify_token_missing_sub(self):
+        """sub（メールアドレス）のないトークンは署名が正しくても無効とする"""
+        token = create_access_token({"name": "テストユーザー"})
+        
+        with pytest.raises(HTTPException) as exc_info:
+            verify_token(token)
+        
+        assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+    
+    def test_verify_token_invalid_cached(self):
+        """検証に失敗したトークンは、短時間は署名検証をせずに無効とされる"""
+        import auth
+        
+        with patch.object(auth._jwt, 'decode', wraps=auth._jwt.decode) as mock_decode:
+            for _ in range(2):
+                with pytest.raises(HTTPException) as exc_info:
+                    verify_token("invalid_token_string")
+                assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+        
+        mock_decode.assert_called_once()
+
+
+@pytest.fixture
+def auth_db(monkeypatch):
+    """authモジュールのDB接続をモックに差し替え、(接続, カーソル)のモックを返す"""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    monkeypatch.setattr("auth.get_db_connection", MagicMock(return_value=mock_conn))
+    monkeypatch.setattr("auth.get_db_cursor", MagicMock(return_value=mock_cursor))
+    monkeypatch.setattr("auth.release_db_connection", MagicMock())
+    return mock_conn, mock_cursor
 
 
 class TestUserFunctions:
     """ユーザー関連関数のテスト"""
     
-    @patch('auth.get_db_connection')
-    @patch('auth.get_db_cursor') # ここが一番目のモック
-    def test_get_user_by_email_found(self, mock_get_cursor, mock_get_conn): # @patchで指定した関数のモック
+    def test_get_user_by_email_found(self, auth_db):
         """メールアドレスでユーザーを検索（見つかる場合）"""
         # モックの設定
-        mock_cursor = MagicMock()
+        _, mock_cursor = auth_db
         mock_cursor.fetchone.return_value = {
             "id": 1,
             "email": "test@example.com",
             "name": "テストユーザー",
             "password_hash": "hashed_password"
         }
-        mock_get_cursor.return_value = mock_cursor
         
         user = get_user_by_email("test@example.com")
         assert user is not None
         assert user["email"] == "test@example.com"
-        mock_cursor.execute.assert_called_once()
+        mock_cursor.fetchone.assert_called_once()
     
-    @patch('auth.get_db_connection')
-    @patch('auth.get_db_cursor')
-    def test_get_user_by_email_not_found(self, mock_get_cursor, mock_get_conn):
+    def test_get_user_by_email_not_found(self, auth_db):
         """メールアドレスでユーザーを検索（見つからない場合）"""
-        mock_cursor = MagicMock()
+        _, mock_cursor = auth_db
         mock_cursor.fetchone.return_value = None
-        mock_get_cursor.return_value = mock_cursor
         
         user = get_user_by_email("nonexistent@example.com")
         assert user is None
     
-    @patch('auth.get_db_connection')
-    @patch('auth.get_db_cursor')
-    def test_create_user_success(self, mock_get_cursor, mock_get_conn):
+    def test_get_user_by_email_prepares_once(self, auth_db):
+        """同じ接続ではPREPAREは初回だけ送られる"""
+        _, mock_cursor = auth_db
+        mock_cursor.fetchone.return_value = None
+        
+        get_user_by_email("first@example.com")
+        get_user_by_email("second@example.com")
+        
+        # 初回はPREPAREとEXECUTE、2回目はEXECUTEだけ
+        sqls = [call.args[0] for call in mock_cursor.execute.call_args_list]
+        assert len(sqls) == 3
+        assert sqls[0].startswith("PREPARE get_user_by_email")
+        assert sqls[1].startswith("EXECUTE get_user_by_email")
+        assert sqls[2].startswith("EXECUTE get_user_by_email")
+    
+    @patch('auth.get_user_by_email')
+    def test_get_user_by_token_cached(self, mock_get_user):
+        """同じトークンの2回目以降はトークン検証もユーザー検索も行わない"""
+        mock_get_user.return_value = {
+            "id": 1,
+            "email": "test@example.com",
+            "name": "テストユーザー",
+            "password_hash": "hashed_password"
+        }
+        token = create_access_token({"sub": "test@example.com"})
+        
+        user1 = get_user_by_token(token)
+        user1["name"] = "書き換え"
+        with patch('auth.verify_token') as mock_verify:
+            user2 = get_user_by_token(token)
+        
+        assert "password_hash" not in user2
+        assert user2["name"] == "テストユーザー"
+        mock_get_user.assert_called_once()
+        mock_verify.assert_not_called()
+    
+    @patch('auth.get_user_by_email')
+    def test_get_user_by_token_not_found_not_cached(self, mock_get_user):
+        """ユーザーが見つからない結果はキャッシュされない"""
+        mock_get_user.return_value = None
+        token = create_access_token({"sub": "missing@example.com"})
+        
+        for _ in range(2):
+            with pytest.raises(HTTPException) as exc_info:
+                get_user_by_token(token)
+            assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+        
+        assert mock_get_user.call_count == 2
+    
+    def test_get_user_by_email_cached(self, auth_db):
+        """2回目以降の検索はキャッシュから返される"""
+        _, mock_cursor = auth_db
+        mock_cursor.fetchone.return_value = {
+            "id": 1,
+            "email": "test@example.com",
+            "name": "テストユーザー",
+            "password_hash": "hashed_password"
+        }
+        
+        user1 = get_user_by_email("test@example.com")
+        # 呼び出し元で変更してもキャッシュには影響しない
+        user1.pop("password_hash")
+        user2 = get_user_by_email("test@example.com")
+        
+        assert user2["password_hash"] == "hashed_password"
+        mock_cursor.fetchone.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_create_user_success(self, auth_db):
         """ユーザー作成（成功）のテスト"""
-        mock_cursor = MagicMock()
+        mock_conn, mock_cursor = auth_db
         mock_cursor.fetchone.return_value = {
             "id": 1,
             "email": "new@example.com",
             "name": "新規ユーザー",
             "created_at": "2024-01-01T00:00:00"
         }
-        mock_get_cursor.return_value = mock_cursor
-        mock_conn = MagicMock()
-        mock_get_conn.return_value = mock_conn
         
-        user = create_user("new@example.com", "password123", "新規ユーザー")
+        user = await create_user("new@example.com", "password123", "新規ユーザー")
         assert user is not None
         assert user["email"] == "new@example.com"
         mock_conn.commit.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_create_user_primes_user_cache(self, auth_db):
+        """登録したユーザーがキャッシュに入り、直後の取得でDBに問い合わせないことのテスト"""
+        _, mock_cursor = auth_db
+        mock_cursor.fetchone.return_value = {
+            "id": 1,
+            "email": "new@example.com",
+            "name": "新規ユーザー",
+            "password_hash": "hashed",
+            "created_at": "2024-01-01T00:00:00"
+        }
+
+        user = await create_user("new@example.com", "password123", "新規ユーザー")
+        assert "password_hash" not in user
+
+        import auth
+        auth.get_db_connection.reset_mock()
+        cached = get_user_by_email("new@example.com")
+        assert cached["password_hash"] == "hashed"
+        auth.get_db_connection.assert_not_called()
     
-    @patch('auth.get_db_connection')
-    @patch('auth.get_db_cursor')
-    def test_create_user_duplicate_email(self, mock_get_cursor, mock_get_conn):
+    @pytest.mark.asyncio
+    async def test_create_user_duplicate_email(self, auth_db):
         """重複メールアドレスでのユーザー作成"""
-        import psycopg2
-        
-        mock_cursor = MagicMock()
-        mock_cursor.execute.side_effect = psycopg2.IntegrityError("unique constraint")
-        mock_get_cursor.return_value = mock_cursor
-        mock_conn = MagicMock()
-        mock_get_conn.return_value = mock_conn
+        mock_conn, mock_cursor = auth_db
+        # ON CONFLICT DO NOTHING で挿入がスキップされると行が返らない
+        mock_cursor.fetchone.return_value = None
         
         with pytest.raises(HTTPException) as exc_info:
-            create_user("existing@example.com", "password123", "ユーザー")
+            await create_user("existing@example.com", "password123", "ユーザー")
         
         assert exc_info.value.status_code == status.HTTP_400_BAD_REQUEST
         assert "既に登録されています" in exc_info.value.detail
-        mock_conn.rollback.assert_called_once()
+        mock_conn.rollback.assert_not_called()
     
     @patch('auth.get_user_by_email')
     @patch('auth.verify_password')
-    def test_authenticate_user_success(self, mock_verify, mock_get_user):
+    @pytest.mark.asyncio
+    async def test_authenticate_user_success(self, mock_verify, mock_get_user):
         """ユーザー認証（成功）のテスト"""
         mock_get_user.return_value = {
             "id": 1,
@@ -150,24 +307,40 @@ class TestUserFunctions:
         }
         mock_verify.return_value = True
         
-        user = authenticate_user("test@example.com", "password123")
+        user = await authenticate_user("test@example.com", "password123")
         assert user is not None
         assert user["email"] == "test@example.com"
         assert "password_hash" not in user
     
     @patch('auth.get_user_by_email')
-    def test_authenticate_user_not_found(self, mock_get_user):
+    @pytest.mark.asyncio
+    async def test_authenticate_user_not_found(self, mock_get_user):
         """ユーザー認証（ユーザーが見つからない場合）"""
         mock_get_user.return_value = None
         
         with pytest.raises(HTTPException) as exc_info:
-            authenticate_user("nonexistent@example.com", "password123")
+            await authenticate_user("nonexistent@example.com", "password123")
         
         assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
     
     @patch('auth.get_user_by_email')
     @patch('auth.verify_password')
-    def test_authenticate_user_wrong_password(self, mock_verify, mock_get_user):
+    @pytest.mark.asyncio
+    async def test_authenticate_user_not_found_still_verifies(self, mock_verify, mock_get_user):
+        """ユーザーが見つからない場合もパスワード照合を行う（応答時間を揃える）"""
+        mock_get_user.return_value = None
+        mock_verify.return_value = True
+        
+        with pytest.raises(HTTPException) as exc_info:
+            await authenticate_user("nonexistent@example.com", "password123")
+        
+        assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+        mock_verify.assert_called_once()
+    
+    @patch('auth.get_user_by_email')
+    @patch('auth.verify_password')
+    @pytest.mark.asyncio
+    async def test_authenticate_user_wrong_password(self, mock_verify, mock_get_user):
         """ユーザー認証（パスワードが間違っている場合）"""
         mock_get_user.return_value = {
             "id": 1,
@@ -178,7 +351,28 @@ class TestUserFunctions:
         mock_verify.return_value = False
         
         with pytest.raises(HTTPException) as exc_info:
-            authenticate_user("test@example.com", "wrongpassword")
+            await authenticate_user("test@example.com", "wrongpassword")
         
         assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
-
+    
+    @patch('auth._update_password_hash')
+    @patch('auth.get_user_by_email')
+    @pytest.mark.asyncio
+    async def test_authenticate_user_rehashes_legacy_bcrypt(self, mock_get_user, mock_update):
+        """bcryptで保存されたユーザーはログイン成功時にargon2idへ置き換えられる"""
+        import bcrypt
+        mock_get_user.return_value = {
+            "id": 1,
+            "email": "test@example.com",
+            "name": "テストユーザー",
+            "password_hash": bcrypt.hashpw(b"password123", bcrypt.gensalt(rounds=4)).decode("utf-8")
+        }
+        
+        user = await authenticate_user("test@example.com", "password123")
+        
+        assert "password_hash" not in user
+        mock_update.assert_called_once()
+        user_id, email, new_hash = mock_update.call_args.args
+        assert (user_id, email) == (1, "test@example.com")
+        assert new_hash.startswith("$argon2id$")
+        assert verify_password("password123", new_hash) is True
@@ -0,0 +1,17 @@
+"""
+ChatKitセッション作成のテスト
+"""
+import pytest
+from fastapi import status
+
+
+class TestChatKitSession:
+    """ChatKitセッション作成のテスト"""
+    
+    def test_create_session_success(self, client, mock_openai):
+        """正常なセッション作成"""
+        response = client.post("/api/chatkit/session")
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"client_secret": "session_test_secret"}
+        mock_openai.beta.chatkit.sessions.create.assert_awaited_once()
@@ -0,0 +1,41 @@
+"""
+CORSミドルウェアのテスト
+"""
+import pytest
+from fastapi import status
+
+
+class TestCORS:
+    """CORSヘッダーのテスト"""
+
+    def test_preflight(self, client):
+        """プリフライトはアプリを通さずに204で応答する"""
+        response = client.options(
+            "/api/reservations",
+            headers={
+                "Origin": "http://localhost:5173",
+                "Access-Control-Request-Method": "POST",
+                "Access-Control-Request-Headers": "authorization, content-type",
+            },
+        )
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert response.headers["access-control-allow-origin"] == "http://localhost:5173"
+        assert response.headers["access-control-allow-credentials"] == "true"
+        assert response.headers["access-control-allow-headers"] == "authorization, content-type"
+        assert "POST" in response.headers["access-control-allow-methods"]
+
+    def test_simple_request(self, client):
+        """通常のリクエストにはアプリの応答にCORSヘッダーが追加される"""
+        response = client.get("/health", headers={"Origin": "http://localhost:5173"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["access-control-allow-origin"] == "http://localhost:5173"
+        assert response.headers["vary"] == "Origin"
+
+    def test_same_origin_request(self, client):
+        """Originヘッダーのないリクエストにはヘッダーを追加しない"""
+        response = client.get("/health")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "access-control-allow-origin" not in response.headers
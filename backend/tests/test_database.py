@@ -0,0 +1,46 @@
+"""
+データベースモジュール（database.py）のテスト
+"""
+import psycopg2
+import pytest
+
+from database import DB_CONFIG, execute_prepared
+
+
+@pytest.fixture
+def conn(test_db):
+    """プールを通さない専用の接続（プリペアドステートメントは接続ごとに管理されるため）"""
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+class TestExecutePrepared:
+    """プリペアドステートメントの実行のテスト"""
+
+    def test_prepare_once(self, conn):
+        """2回目以降はEXECUTEだけで同じ結果が返る"""
+        cursor = conn.cursor()
+        for value in (1, 2):
+            execute_prepared(cursor, "test_prepare_once", "SELECT $1::int + 1", (value,))
+            assert cursor.fetchone() == (value + 1,)
+
+    def test_failed_prepare_is_retried(self, conn):
+        """PREPAREが失敗した場合は準備済みとして扱わず、次の呼び出しで作り直す"""
+        cursor = conn.cursor()
+        statement = "SELECT count(*) FROM test_prepare_target WHERE id = $1"
+        with pytest.raises(psycopg2.errors.UndefinedTable):
+            execute_prepared(cursor, "test_failed_prepare", statement, (1,))
+        conn.rollback()
+
+        cursor.execute("CREATE TEMPORARY TABLE test_prepare_target (id int)")
+        execute_prepared(cursor, "test_failed_prepare", statement, (1,))
+        assert cursor.fetchone() == (0,)
+
+    def test_percent_literal(self, conn):
+        """SQL中の%はパラメータの埋め込みと衝突しない"""
+        cursor = conn.cursor()
+        execute_prepared(cursor, "test_percent_literal", "SELECT $1::text LIKE 'a%'", ("abc",))
+        assert cursor.fetchone() == (True,)
@@ -8,7 +8,7 @@ from fastapi import status
 class TestGetMenus:
     """メニュー取得のテスト"""
     
-    def test_get_menus_success(self, client, test_db, test_menu):
+    def test_get_menus_success(self, client, db_tx, test_menu):
         """正常なメニュー取得"""
         response = client.get("/api/menus")
         
@@ -21,29 +21,20 @@ class TestGetMenus:
         menu_ids = [menu["id"] for menu in data]
         assert test_menu["id"] in menu_ids
     
-    def test_get_menus_only_available(self, client, test_db):
-        """利用可能なメニューのみ取得"""
-        from database import get_db_connection, get_db_cursor
-        
-        # 利用不可メニューを作成
-        conn = get_db_connection()
-        cursor = get_db_cursor(conn)
-        try:
-            cursor.execute("""
-                INSERT INTO menus (name, description, price, is_available)
-                VALUES (%s, %s, %s, %s)
-                RETURNING id
-            """, ("利用不可メニュー", "テスト", 1000, False))
-            unavailable_menu_id = cursor.fetchone()["id"]
-            conn.commit()
-        finally:
-            cursor.close()
-            conn.close()
+    def test_get_menus_not_modified(self, client, db_tx, test_menu):
+        """ETagが一致する場合は304を返す"""
+        response = client.get("/api/menus")
+        assert response.headers["cache-control"] == "public, max-age=60"
         
+        response = client.get("/api/menus", headers={"If-None-Match": response.headers["etag"]})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    
+    def test_get_menus_only_available(self, client, unavailable_menu):
+        """利用可能なメニューのみ取得"""
         response = client.get("/api/menus")
         assert response.status_code == status.HTTP_200_OK
         
         data = response.json()
         menu_ids = [menu["id"] for menu in data]
-        assert unavailable_menu_id not in menu_ids
+        assert unavailable_menu["id"] not in menu_ids
 
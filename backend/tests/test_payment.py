@@ -3,6 +3,7 @@
 """
 import pytest
 from fastapi import status
+import os
 
 
 class TestCreatePaymentIntent:
@@ -14,7 +15,7 @@ class TestCreatePaymentIntent:
             {"menu_id": test_menu["id"], "quantity": 2}
         ]
         
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
+        headers = test_user["headers"]
         response = client.post("/api/payments/create-intent", json=menu_items, headers=headers)
         
         assert response.status_code == status.HTTP_200_OK
@@ -26,7 +27,7 @@ class TestCreatePaymentIntent:
     
     def test_create_payment_intent_no_menu(self, client, test_user):
         """メニューが選択されていない場合"""
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
+        headers = test_user["headers"]
         response = client.post("/api/payments/create-intent", json=[], headers=headers)
         
         assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -39,35 +40,18 @@ class TestCreatePaymentIntent:
             {"menu_id": 99999, "quantity": 1}
         ]
         
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
+        headers = test_user["headers"]
         response = client.post("/api/payments/create-intent", json=menu_items, headers=headers)
         
         assert response.status_code == status.HTTP_400_BAD_REQUEST
     
-    def test_create_payment_intent_unavailable_menu(self, client, test_user, test_db):
+    def test_create_payment_intent_unavailable_menu(self, client, test_user, unavailable_menu):
         """利用不可メニューの選択"""
-        from database import get_db_connection, get_db_cursor
-        
-        # 利用不可メニューを作成
-        conn = get_db_connection()
-        cursor = get_db_cursor(conn)
-        try:
-            cursor.execute("""
-                INSERT INTO menus (name, description, price, is_available)
-                VALUES (%s, %s, %s, %s)
-                RETURNING id
-            """, ("利用不可メニュー", "テスト", 1000, False))
-            unavailable_menu_id = cursor.fetchone()["id"]
-            conn.commit()
-        finally:
-            cursor.close()
-            conn.close()
-        
         menu_items = [
-            {"menu_id": unavailable_menu_id, "quantity": 1}
+            {"menu_id": unavailable_menu["id"], "quantity": 1}
         ]
         
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
+        headers = test_user["headers"]
         response = client.post("/api/payments/create-intent", json=menu_items, headers=headers)
         
         assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -87,23 +71,9 @@ class TestCreatePaymentIntent:
 class TestRefundPayment:
     """返金機能のテスト"""
     
-    def test_refund_payment_success(self, client, test_user, test_menu, mock_stripe):
-        """正常な返金処理"""
-        from datetime import date, timedelta
-        
-        # 予約を作成（決済済み）
-        reservation_data = {
-            "reservation_date": str(date.today() + timedelta(days=7)),
-            "reservation_time": "18:00",
-            "number_of_people": 2,
-            "menu_items": [
-                {"menu_id": test_menu["id"], "quantity": 1}
-            ],
-            "payment_intent_id": "pi_test_123"
-        }
-        
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
-        create_response = client.post("/api/reservations", json=reservation_data, headers=headers)
+    def test_refund_payment_success(self, client, test_user, created_reservation, mock_stripe):
+        """正常な返金処理（決済済みの予約を返金する）"""
+        headers = test_user["headers"]
         
         # 返金を実行
         payment_intent_id = "pi_test_123"
@@ -118,10 +88,15 @@ class TestRefundPayment:
         assert "amount" in data
         assert "status" in data
         assert data["status"] == "succeeded"
+        # Payment Intentを取得せず、冪等キー付きで直接返金する
+        mock_stripe.Refund.create.assert_called_once_with(
+            payment_intent=payment_intent_id,
+            idempotency_key=f"refund-{payment_intent_id}"
+        )
     
     def test_refund_payment_not_found(self, client, test_user):
         """存在しない予約の返金"""
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
+        headers = test_user["headers"]
         response = client.post(
             "/api/payments/refund/pi_nonexistent",
             headers=headers
@@ -129,23 +104,9 @@ class TestRefundPayment:
         
         assert response.status_code == status.HTTP_404_NOT_FOUND
     
-    def test_refund_payment_already_refunded(self, client, test_user, test_menu, mock_stripe):
+    def test_refund_payment_already_refunded(self, client, test_user, created_reservation):
         """既に返金済みの場合"""
-        from datetime import date, timedelta
-        
-        # 予約を作成
-        reservation_data = {
-            "reservation_date": str(date.today() + timedelta(days=7)),
-            "reservation_time": "18:00",
-            "number_of_people": 2,
-            "menu_items": [
-                {"menu_id": test_menu["id"], "quantity": 1}
-            ],
-            "payment_intent_id": "pi_test_123"
-        }
-        
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
-        client.post("/api/reservations", json=reservation_data, headers=headers)
+        headers = test_user["headers"]
         
         # 1回目の返金
         payment_intent_id = "pi_test_123"
@@ -166,3 +127,22 @@ class TestRefundPayment:
         response = client.post("/api/payments/refund/pi_test_123")
         assert response.status_code == status.HTTP_403_FORBIDDEN
 
+
+class TestGetStripePublishableKey:
+    """Stripe公開キー取得のテスト"""
+    
+    def test_get_publishable_key_success(self, client):
+        """正常な公開キー取得"""
+        response = client.get("/api/stripe/publishable-key")
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert "publishable_key" in data
+        assert data["publishable_key"] == os.getenv("STRIPE_PUBLISHABLE_KEY", "pk_test_mock")
+    
+    def test_get_publishable_key_not_configured(self, client, monkeypatch):
+        """公開キーが設定されていない場合は500を返す（キーはリクエストごとに環境変数から読む）"""
+        monkeypatch.delenv("STRIPE_PUBLISHABLE_KEY", raising=False)
+        
+        response = client.get("/api/stripe/publishable-key")
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
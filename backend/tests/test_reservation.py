@@ -3,8 +3,33 @@
 """
 import pytest
 from fastapi import status
+from unittest.mock import patch
 from datetime import date, timedelta
 
+from slack_notification import wait_for_notifications
+
+# テストで使う予約日（モジュールの読み込み時に1回だけ計算し、すべてのテストで同じ日付を使う）
+_TODAY = date.today()
+_FUTURE = str(_TODAY + timedelta(days=7))
+_FUTURE_NEXT_DAY = str(_TODAY + timedelta(days=8))
+_TOMORROW = str(_TODAY + timedelta(days=1))
+_PAST = str(_TODAY - timedelta(days=1))
+
+# 予約データの基本形（各テストでは {**_BASE_RESERVATION, ...} で必要な項目だけ追加・上書きする）
+_BASE_RESERVATION = {
+    "reservation_date": _FUTURE,
+    "reservation_time": "18:00",
+    "number_of_people": 2
+}
+# 決済済みの予約データ
+_PAID_RESERVATION = {**_BASE_RESERVATION, "payment_intent_id": "pi_test_123"}
+
+
+def _notified_messages(mock_slack) -> list:
+    """Slackに送信された通知の一覧（まとめて送信された通知は1件ずつに分ける）"""
+    wait_for_notifications()
+    return [line for call in mock_slack.call_args_list for line in call.args[0].split("\n")]
+
 
 class TestCreateReservation:
     """予約作成のテスト"""
@@ -13,17 +38,14 @@ class TestCreateReservation:
         """正常な予約作成（決済あり）"""
         # Payment Intentを作成（モック）
         reservation_data = {
-            "reservation_date": str(date.today() + timedelta(days=7)),
-            "reservation_time": "18:00",
-            "number_of_people": 2,
+            **_PAID_RESERVATION,
             "special_requests": "窓際の席をお願いします",
             "menu_items": [
                 {"menu_id": test_menu["id"], "quantity": 2}
-            ],
-            "payment_intent_id": "pi_test_123"
+            ]
         }
         
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
+        headers = test_user["headers"]
         response = client.post("/api/reservations", json=reservation_data, headers=headers)
         
         assert response.status_code == status.HTTP_200_OK
@@ -35,70 +57,130 @@ class TestCreateReservation:
         assert data["menu_items"][0]["menu_id"] == test_menu["id"]
         assert data["menu_items"][0]["quantity"] == 2
     
-    def test_create_reservation_no_auth(self, client, test_db):
-        """認証なしでの予約作成"""
-        reservation_data = {
-            "reservation_date": str(date.today() + timedelta(days=7)),
-            "reservation_time": "18:00",
-            "number_of_people": 2
-        }
+    def test_create_reservation_payment_intent_cached(self, client, test_user, mock_stripe):
+        """決済完了したPayment Intentは続けて確認してもStripe APIを1回しか呼ばない"""
+        headers = test_user["headers"]
+        for _ in range(2):
+            response = client.post("/api/reservations", json=_PAID_RESERVATION, headers=headers)
+            assert response.status_code == status.HTTP_200_OK
         
-        response = client.post("/api/reservations", json=reservation_data)
-        assert response.status_code == status.HTTP_403_FORBIDDEN
+        mock_stripe.PaymentIntent.retrieve.assert_called_once_with("pi_test_123")
     
     def test_create_reservation_invalid_date(self, client, test_user):
         """過去の日付での予約作成（バリデーションは実装次第）"""
-        reservation_data = {
-            "reservation_date": str(date.today() - timedelta(days=1)),
-            "reservation_time": "18:00",
-            "number_of_people": 2,
-            "menu_items": []
-        }
+        reservation_data = {**_BASE_RESERVATION, "reservation_date": _PAST, "menu_items": []}
         
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
+        headers = test_user["headers"]
         response = client.post("/api/reservations", json=reservation_data, headers=headers)
         # 過去の日付はエラーになる可能性がある（実装次第）
         # ここでは200または400のどちらかになることを想定
         assert response.status_code in [status.HTTP_200_OK, status.HTTP_400_BAD_REQUEST]
     
+    def test_create_reservation_invalid_time(self, client, test_user):
+        """時間の形式が正しくない場合はDBに触れる前に422を返す"""
+        reservation_data = {**_BASE_RESERVATION, "reservation_date": _TOMORROW, "reservation_time": "25:00"}
+        
+        headers = test_user["headers"]
+        response = client.post("/api/reservations", json=reservation_data, headers=headers)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    
     def test_create_reservation_invalid_payment_intent(self, client, test_user, test_menu, mock_stripe):
         """無効なPayment Intent ID"""
         # Payment Intentを失敗状態に設定
         mock_stripe.PaymentIntent.retrieve.return_value.status = "requires_payment_method"
         
         reservation_data = {
-            "reservation_date": str(date.today() + timedelta(days=7)),
-            "reservation_time": "18:00",
-            "number_of_people": 2,
+            **_BASE_RESERVATION,
             "menu_items": [
                 {"menu_id": test_menu["id"], "quantity": 1}
             ],
             "payment_intent_id": "pi_test_invalid"
         }
         
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
+        headers = test_user["headers"]
         response = client.post("/api/reservations", json=reservation_data, headers=headers)
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
 
+class TestCreateReservationsBulk:
+    """予約の一括作成のテスト"""
+    
+    def test_create_reservations_bulk_success(self, client, test_user, test_menu, mock_stripe, mock_slack):
+        """複数の予約をまとめて作成（リクエストと同じ順序で返る）"""
+        reservations_data = [
+            {
+                **_PAID_RESERVATION,
+                "menu_items": [
+                    {"menu_id": test_menu["id"], "quantity": 2}
+                ]
+            },
+            {
+                "reservation_date": _FUTURE_NEXT_DAY,
+                "reservation_time": "19:30",
+                "number_of_people": 4,
+                "special_requests": "個室希望"
+            },
+        ]
+        
+        headers = test_user["headers"]
+        response = client.post("/api/reservations/bulk", json=reservations_data, headers=headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert [item["number_of_people"] for item in data] == [2, 4]
+        assert data[0]["payment_status"] == "succeeded"
+        assert data[0]["menu_items"][0]["menu_id"] == test_menu["id"]
+        assert data[0]["menu_items"][0]["quantity"] == 2
+        assert data[1]["reservation_time"] == "19:30:00"
+        assert data[1]["special_requests"] == "個室希望"
+        assert data[1]["payment_status"] == "pending"
+        assert len(_notified_messages(mock_slack)) == 2
+        
+        # 一覧にも反映されている
+        list_response = client.get("/api/reservations", headers=headers)
+        assert len(list_response.json()) == 2
+    
+    def test_create_reservations_bulk_empty(self, client, test_user):
+        """空のリストはエラー"""
+        headers = test_user["headers"]
+        response = client.post("/api/reservations/bulk", json=[], headers=headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_create_reservations_bulk_too_many(self, client, test_user, mock_stripe):
+        """上限を超える件数はStripeへの確認を行わずにエラー"""
+        from server import _MAX_BULK_RESERVATIONS
+        
+        headers = test_user["headers"]
+        response = client.post(
+            "/api/reservations/bulk",
+            json=[_PAID_RESERVATION] * (_MAX_BULK_RESERVATIONS + 1),
+            headers=headers
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        mock_stripe.PaymentIntent.retrieve.assert_not_called()
+    
+    def test_create_reservations_bulk_invalid_payment(self, client, test_user, test_menu, mock_stripe):
+        """決済が完了していない予約が含まれる場合は1件も作成しない"""
+        mock_stripe.PaymentIntent.retrieve.return_value.status = "requires_payment_method"
+        reservations_data = [
+            _BASE_RESERVATION,
+            {**_BASE_RESERVATION, "reservation_date": _FUTURE_NEXT_DAY, "payment_intent_id": "pi_test_invalid"},
+        ]
+        
+        headers = test_user["headers"]
+        response = client.post("/api/reservations/bulk", json=reservations_data, headers=headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+        list_response = client.get("/api/reservations", headers=headers)
+        assert list_response.json() == []
+
+
 class TestGetReservations:
     """予約一覧取得のテスト"""
     
-    def test_get_reservations_success(self, client, test_user, test_menu, mock_stripe):
+    def test_get_reservations_success(self, client, test_user, created_reservation):
         """正常な予約一覧取得"""
-        # まず予約を作成
-        reservation_data = {
-            "reservation_date": str(date.today() + timedelta(days=7)),
-            "reservation_time": "18:00",
-            "number_of_people": 2,
-            "menu_items": [
-                {"menu_id": test_menu["id"], "quantity": 1}
-            ],
-            "payment_intent_id": "pi_test_123"
-        }
-        
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
-        client.post("/api/reservations", json=reservation_data, headers=headers)
+        headers = test_user["headers"]
         
         # 予約一覧を取得
         response = client.get("/api/reservations", headers=headers)
@@ -107,43 +189,98 @@ class TestGetReservations:
         data = response.json()
         assert isinstance(data, list)
         assert len(data) >= 1
+        assert data[0]["id"] == created_reservation["id"]
         assert data[0]["user_id"] == test_user["id"]
     
-    def test_get_reservations_no_auth(self, client):
-        """認証なしでの予約一覧取得"""
-        response = client.get("/api/reservations")
-        assert response.status_code == status.HTTP_403_FORBIDDEN
+    def test_get_reservations_order(self, client, test_user, seed_reservations):
+        """予約は日付・時間の新しい順に返る"""
+        today = _TODAY
+        reservation_ids = seed_reservations(test_user["id"], [
+            {"reservation_date": today + timedelta(days=1), "reservation_time": "18:00", "number_of_people": 2},
+            {"reservation_date": today + timedelta(days=3), "reservation_time": "12:00", "number_of_people": 4},
+            {"reservation_date": today + timedelta(days=1), "reservation_time": "20:30", "number_of_people": 1},
+        ])
+        
+        headers = test_user["headers"]
+        response = client.get("/api/reservations", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        
+        data = response.json()
+        assert [reservation["id"] for reservation in data] == [reservation_ids[1], reservation_ids[2], reservation_ids[0]]
+        assert data[1]["reservation_time"] == "20:30:00"
     
     def test_get_reservations_empty(self, client, test_user):
         """予約がない場合"""
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
+        headers = test_user["headers"]
         response = client.get("/api/reservations", headers=headers)
         assert response.status_code == status.HTTP_200_OK
         
         data = response.json()
         assert isinstance(data, list)
         # 初期状態では空の可能性がある
+    
+    def test_get_reservations_not_modified(self, client, test_user):
+        """ETagが一致する場合は304を返す"""
+        headers = test_user["headers"]
+        response = client.get("/api/reservations", headers=headers)
+        etag = response.headers["etag"]
+        
+        response = client.get("/api/reservations", headers={**headers, "If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    
+    def test_get_reservations_cache_invalidated_on_create(self, client, test_user, mock_stripe):
+        """予約を作成すると、キャッシュされた一覧が更新される"""
+        headers = test_user["headers"]
+        response = client.get("/api/reservations", headers=headers)
+        etag = response.headers["etag"]
+        assert response.json() == []
+        
+        client.post("/api/reservations", json=_BASE_RESERVATION, headers=headers)
+        
+        response = client.get("/api/reservations", headers={**headers, "If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) == 1
+
+
+    def test_get_reservations_cache_hit_without_db(self, client, test_user):
+        """キャッシュにある一覧はDB接続を借りずに返す（依存関数get_db経由の取得も含めて確認する）"""
+        import database
+        import server
+        
+        headers = test_user["headers"]
+        first = client.get("/api/reservations", headers=headers)
+        
+        with patch.object(database, "get_db_connection") as db_get_connection, \
+             patch.object(server, "get_db_connection") as server_get_connection:
+            response = client.get("/api/reservations", headers={**headers, "If-None-Match": first.headers["etag"]})
+        
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        db_get_connection.assert_not_called()
+        server_get_connection.assert_not_called()
+    
+    def test_get_reservations_not_cached_when_changed_during_fetch(self, client, test_user):
+        """一覧の取得中に予約が変更された場合は、取得した一覧をキャッシュに入れない"""
+        import server
+        
+        def fetch_and_change(conn, user_id):
+            # 取得した直後に、別のリクエストで予約が作成された状況を再現する
+            server._invalidate_reservations_cache(user_id)
+            return []
+        
+        with patch.object(server, "_fetch_reservations", side_effect=fetch_and_change):
+            response = client.get("/api/reservations", headers=test_user["headers"])
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert test_user["id"] not in server._RESERVATIONS_CACHE
 
 
 class TestCancelReservation:
     """予約キャンセルのテスト"""
     
-    def test_cancel_reservation_success(self, client, test_user, test_menu, mock_stripe, mock_slack):
+    def test_cancel_reservation_success(self, client, test_user, created_reservation, mock_slack):
         """正常な予約キャンセル"""
-        # 予約を作成
-        reservation_data = {
-            "reservation_date": str(date.today() + timedelta(days=7)),
-            "reservation_time": "18:00",
-            "number_of_people": 2,
-            "menu_items": [
-                {"menu_id": test_menu["id"], "quantity": 1}
-            ],
-            "payment_intent_id": "pi_test_123"
-        }
-        
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
-        create_response = client.post("/api/reservations", json=reservation_data, headers=headers)
-        reservation_id = create_response.json()["id"]
+        headers = test_user["headers"]
+        reservation_id = created_reservation["id"]
         
         # 予約をキャンセル
         response = client.delete(f"/api/reservations/{reservation_id}", headers=headers)
@@ -152,46 +289,46 @@ class TestCancelReservation:
         data = response.json()
         assert "message" in data
         assert "キャンセルされました" in data["message"]
+        # 予約確定・キャンセルの通知が通知用のスレッドで送信されている
+        messages = _notified_messages(mock_slack)
+        assert len(messages) == 2
+        assert "キャンセル" in messages[1]
     
     def test_cancel_reservation_not_found(self, client, test_user):
         """存在しない予約のキャンセル"""
-        headers = {"Authorization": f"Bearer {test_user['token']}"}
+        headers = test_user["headers"]
         response = client.delete("/api/reservations/99999", headers=headers)
         assert response.status_code == status.HTTP_404_NOT_FOUND
     
-    def test_cancel_reservation_no_auth(self, client):
-        """認証なしでの予約キャンセル"""
-        response = client.delete("/api/reservations/1")
-        assert response.status_code == status.HTTP_403_FORBIDDEN
-    
-    def test_cancel_reservation_other_user(self, client, test_db, test_user, test_menu, mock_stripe):
+    def test_cancel_reservation_other_user(self, client, test_user, other_user, test_menu, mock_stripe):
         """他のユーザーの予約をキャンセルしようとする"""
-        # 別ユーザーを作成
-        user2_data = {
-            "email": "user2@example.com",
-            "password": "password123",
-            "name": "ユーザー2"
-        }
-        user2_response = client.post("/api/auth/register", json=user2_data)
-        user2_token = user2_response.json()["access_token"]
-        
-        # ユーザー2で予約を作成
+        # 別のユーザーで予約を作成
         reservation_data = {
-            "reservation_date": str(date.today() + timedelta(days=7)),
-            "reservation_time": "18:00",
-            "number_of_people": 2,
+            **_PAID_RESERVATION,
             "menu_items": [
                 {"menu_id": test_menu["id"], "quantity": 1}
-            ],
-            "payment_intent_id": "pi_test_123"
+            ]
         }
         
-        user2_headers = {"Authorization": f"Bearer {user2_token}"}
-        create_response = client.post("/api/reservations", json=reservation_data, headers=user2_headers)
+        create_response = client.post("/api/reservations", json=reservation_data, headers=other_user["headers"])
         reservation_id = create_response.json()["id"]
         
         # 別のユーザー（test_user）でキャンセルを試みる
-        test_user_headers = {"Authorization": f"Bearer {test_user['token']}"}
+        test_user_headers = test_user["headers"]
         response = client.delete(f"/api/reservations/{reservation_id}", headers=test_user_headers)
         assert response.status_code == status.HTTP_404_NOT_FOUND
 
+
+class TestReservationNoAuth:
+    """認証なしでの予約APIの呼び出し"""
+    
+    @pytest.mark.parametrize("method, url, body", [
+        ("POST", "/api/reservations", _BASE_RESERVATION),  # 予約作成
+        ("POST", "/api/reservations/bulk", [_BASE_RESERVATION]),  # 予約の一括作成
+        ("GET", "/api/reservations", None),  # 予約一覧取得
+        ("DELETE", "/api/reservations/1", None),  # 予約キャンセル
+    ])
+    def test_no_auth(self, client, method, url, body):
+        """Authorizationヘッダーがない場合は403を返す"""
+        response = client.request(method, url, json=body)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
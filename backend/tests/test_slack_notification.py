@@ -0,0 +1,202 @@
+"""
+Slack通知モジュール（slack_notification.py）のユニットテスト
+"""
+import orjson
+import pytest
+import requests
+from unittest.mock import patch, MagicMock
+import slack_notification
+from slack_notification import (
+    send_slack_notification,
+    format_reservation_date,
+    format_reservation_time,
+    wait_for_notifications,
+    warm_up_slack_connection,
+    _TokenBucket,
+)
+
+
+def _response(status_code: int, headers: dict = None) -> MagicMock:
+    """Slack Webhookの応答のモックを作る"""
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.text = ""
+    return response
+
+
+@pytest.fixture
+def mock_post():
+    """Webhookへの送信と待ち時間をモックに差し替える（流量制限による待ちは行わない）"""
+    with patch.object(slack_notification, "SLACK_WEBHOOK_URL", "https://hooks.slack.com/test/mock"), \
+         patch.object(slack_notification, "_rate_limiter") as rate_limiter, \
+         patch.object(slack_notification._SESSION, "post") as post, \
+         patch.object(slack_notification.time, "sleep") as sleep:
+        post.sleep = sleep
+        post.rate_limiter = rate_limiter
+        yield post
+
+
+class TestFormat:
+    """予約日・予約時間のフォーマットのテスト"""
+
+    def test_format_reservation_date(self):
+        """日付を日本語形式にし、形式が正しくない場合はそのまま返す"""
+        assert format_reservation_date("2024-01-15") == "2024年01月15日"
+        assert format_reservation_date("不明") == "不明"
+
+    def test_format_reservation_time(self):
+        """時間を日本語形式にし、形式が正しくない場合はそのまま返す"""
+        assert format_reservation_time("18:00:00") == "18時0分"
+        assert format_reservation_time("9:30") == "9時30分"
+        assert format_reservation_time("不明") == "不明"
+
+
+class TestSendSlackNotification:
+    """Slackへの送信と再試行のテスト"""
+
+    def test_send_success(self, mock_post):
+        """200が返れば1回で成功する"""
+        mock_post.return_value = _response(200)
+
+        assert send_slack_notification("テスト", [{"type": "divider"}]) is True
+        assert mock_post.call_count == 1
+        mock_post.sleep.assert_not_called()
+        # 本文はJSONに変換して送る
+        assert orjson.loads(mock_post.call_args.kwargs["data"]) == {"text": "テスト", "blocks": [{"type": "divider"}]}
+        assert mock_post.call_args.kwargs["headers"]["Content-Type"] == "application/json"
+
+    def test_webhook_not_configured(self, mock_post):
+        """Webhookが設定されていない場合は送信しない"""
+        with patch.object(slack_notification, "SLACK_WEBHOOK_URL", None):
+            assert send_slack_notification("テスト") is False
+
+        mock_post.assert_not_called()
+
+    def test_retry_after_rate_limited(self, mock_post):
+        """429の場合はRetry-Afterの秒数だけ待って再試行する"""
+        mock_post.side_effect = [_response(429, {"Retry-After": "3"}), _response(200)]
+
+        assert send_slack_notification("テスト") is True
+        assert mock_post.call_count == 2
+        mock_post.sleep.assert_called_once_with(3.0)
+        mock_post.rate_limiter.on_throttled.assert_called_once()
+        mock_post.rate_limiter.on_success.assert_called_once()
+
+    def test_retry_server_error(self, mock_post):
+        """5xxや接続エラーの場合は指数バックオフで再試行する"""
+        mock_post.side_effect = [_response(503), requests.ConnectionError(), _response(200)]
+
+        assert send_slack_notification("テスト") is True
+        assert mock_post.call_count == 3
+        assert mock_post.sleep.call_count == 2
+
+    def test_read_timeout_not_retried(self, mock_post):
+        """応答待ちのタイムアウトは投稿済みの可能性があるため再試行しない（接続時のタイムアウトは再試行する）"""
+        mock_post.side_effect = [requests.ConnectTimeout(), requests.ReadTimeout(), _response(200)]
+
+        assert send_slack_notification("テスト") is False
+        assert mock_post.call_count == 2
+        mock_post.sleep.assert_called_once()
+
+    def test_retry_exhausted(self, mock_post):
+        """再試行をすべて使い切った場合は失敗とする"""
+        mock_post.return_value = _response(500)
+
+        assert send_slack_notification("テスト") is False
+        assert mock_post.call_count == slack_notification._MAX_ATTEMPTS
+
+    def test_client_error_not_retried(self, mock_post):
+        """400などのクライアントエラーは再試行しない"""
+        mock_post.return_value = _response(400)
+
+        assert send_slack_notification("テスト") is False
+        assert mock_post.call_count == 1
+
+
+class TestSendBatch:
+    """たまった通知をまとめて送信するテスト"""
+
+    def test_single(self):
+        """1件の場合はそのまま送信する"""
+        with patch.object(slack_notification, "send_slack_notification") as send:
+            slack_notification._send_batch([("通知1", [{"type": "header"}])])
+
+        send.assert_called_once_with("通知1", [{"type": "header"}])
+
+    def test_coalesce(self):
+        """複数件の場合は区切り線でつないだ1件のメッセージにする"""
+        with patch.object(slack_notification, "send_slack_notification") as send:
+            slack_notification._send_batch([
+                ("通知1", [{"type": "header"}]),
+                ("通知2", None),
+            ])
+
+        send.assert_called_once_with("通知1\n通知2", [
+            {"type": "header"},
+            {"type": "divider"},
+            {"type": "section", "text": {"type": "mrkdwn", "text": "通知2"}},
+        ])
+
+
+class TestWarmUp:
+    """起動時の事前接続のテスト"""
+
+    def test_warm_up(self):
+        """通知用のスレッドでWebhookにHEADリクエストを送り、接続を張っておく"""
+        with patch.object(slack_notification, "SLACK_WEBHOOK_URL", "https://hooks.slack.com/test/mock"), \
+             patch.object(slack_notification._SESSION, "head") as head:
+            warm_up_slack_connection()
+            wait_for_notifications()
+
+        head.assert_called_once_with("https://hooks.slack.com/test/mock", timeout=slack_notification._WARM_UP_TIMEOUT)
+
+    def test_warm_up_not_configured(self):
+        """Webhookが設定されていない場合は何もしない"""
+        with patch.object(slack_notification, "SLACK_WEBHOOK_URL", None), \
+             patch.object(slack_notification._SESSION, "head") as head:
+            warm_up_slack_connection()
+            wait_for_notifications()
+
+        head.assert_not_called()
+
+
+class TestTokenBucket:
+    """送信レートの流量制限のテスト"""
+
+    def test_burst_then_wait(self):
+        """上限まではすぐに送信でき、それを超えると補充されるまで待つ"""
+        with patch.object(slack_notification.time, "monotonic", return_value=100.0), \
+             patch.object(slack_notification.time, "sleep") as sleep:
+            bucket = _TokenBucket(rate=1.0, capacity=2)
+            bucket.acquire()
+            bucket.acquire()
+            sleep.assert_not_called()
+
+            bucket.acquire()
+            sleep.assert_called_once_with(1.0)
+            bucket.acquire()
+            assert sleep.call_args.args == (2.0,)
+
+    def test_refill(self):
+        """時間が経つとトークンが補充される"""
+        with patch.object(slack_notification.time, "monotonic", side_effect=[100.0, 100.0, 101.5]), \
+             patch.object(slack_notification.time, "sleep") as sleep:
+            bucket = _TokenBucket(rate=1.0, capacity=1)
+            bucket.acquire()
+            bucket.acquire()
+            sleep.assert_not_called()
+
+    def test_aimd(self):
+        """429・5xxで補充の速さを半分にし、成功するたびに元の速さまで少しずつ戻す"""
+        bucket = _TokenBucket(rate=1.0, capacity=1, min_rate=0.2, increase=0.25)
+
+        bucket.on_throttled()
+        assert bucket.rate == 0.5
+        bucket.on_throttled()
+        bucket.on_throttled()
+        assert bucket.rate == 0.2
+
+        for _ in range(10):
+            bucket.on_success()
+        assert bucket.rate == 1.0